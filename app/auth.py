@@ -1,35 +1,106 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import hashlib
+import hmac
 import os
-from datetime import datetime, timedelta, timezone
+import time
 
 import bcrypt
 import jwt
+from cachetools import TLRUCache
 from fastapi import Depends, HTTPException, Request
 
 from . import db
 
 
-_JWT_SECRET: str | None = None
+# Resolved once at import — app.db has already loaded .env by this point.
+# The secret is kept as bytes so PyJWT doesn't re-encode it on every call.
+_JWT_SECRET = os.environ.get("JWT_SECRET", "fallback-dev-secret").encode("utf-8")
+_BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
 
-
-def _get_jwt_secret() -> str:
-    global _JWT_SECRET
-    if _JWT_SECRET is None:
-        _JWT_SECRET = os.environ.get("JWT_SECRET", "fallback-dev-secret")
-    return _JWT_SECRET
+_TOKEN_LIFETIME = 7 * 24 * 3600  # seconds
 
 
 # ---------------------------------------------------------------------------
 # Password hashing
 # ---------------------------------------------------------------------------
 
+# New hashes are bcrypt(hex(sha256(password))) behind this prefix, which keeps
+# long passphrases under bcrypt's 72-byte limit. Unprefixed hashes are legacy
+# plain bcrypt and are upgraded on the next successful login.
+_PREHASH_PREFIX = b"sha256$"
+
+
+def _prehash(password: str) -> bytes:
+    return hashlib.sha256(password.encode("utf-8")).hexdigest().encode("ascii")
+
+
+def _has_prehash_prefix(password_hash: bytes) -> bool:
+    return hmac.compare_digest(password_hash[:len(_PREHASH_PREFIX)], _PREHASH_PREFIX)
+
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    salt = bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)
+    return (_PREHASH_PREFIX + bcrypt.hashpw(_prehash(password), salt)).decode("utf-8")
+
+
+def verify_password(password: str, password_hash: str | bytes) -> bool:
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode("utf-8")
+    if _has_prehash_prefix(password_hash):
+        return bcrypt.checkpw(_prehash(password), password_hash[len(_PREHASH_PREFIX):])
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash)
+
+
+# bcrypt gets its own pool sized to the CPU count so a burst of logins can't
+# occupy every worker of the default executor that asyncio.to_thread shares
+# with the Supabase calls.
+_PW_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt",
+)
+
+
+async def ahash_password(password: str) -> str:
+    """hash_password on the bcrypt pool."""
+    return await asyncio.get_running_loop().run_in_executor(_PW_POOL, hash_password, password)
+
+
+# Identical login attempts already in flight share one bcrypt run instead of
+# each burning ~250ms of CPU. Only touched from the event loop thread.
+_INFLIGHT_VERIFIES: dict[bytes, asyncio.Future] = {}
+
+
+async def averify_password(email: str, password: str, password_hash: str) -> bool:
+    """verify_password on the bcrypt pool, coalescing identical concurrent attempts.
+
+    The key covers the submitted password as well as the account, so attempts
+    with different passwords never share a result.
+    """
+    key = hashlib.blake2b(repr((email, password, password_hash)).encode("utf-8")).digest()
+    task = _INFLIGHT_VERIFIES.get(key)
+    if task is None:
+        task = asyncio.get_running_loop().run_in_executor(
+            _PW_POOL, verify_password, password, password_hash,
+        )
+        _INFLIGHT_VERIFIES[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT_VERIFIES.pop(key, None))
+    # shield: one caller disconnecting must not cancel the others' result
+    return await asyncio.shield(task)
 
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+def password_needs_rehash(password_hash: str | bytes) -> bool:
+    """True for legacy hashes or ones made with a cost other than BCRYPT_ROUNDS."""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode("utf-8")
+    if not _has_prehash_prefix(password_hash):
+        return True
+    try:
+        rounds = int(password_hash[len(_PREHASH_PREFIX):].split(b"$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != _BCRYPT_ROUNDS
 
 
 # ---------------------------------------------------------------------------
@@ -40,13 +111,44 @@ def create_token(user_id: str, role: str) -> str:
     payload = {
         "user_id": user_id,
         "role": role,
-        "exp": datetime.now(timezone.utc) + timedelta(days=7),
+        "exp": int(time.time()) + _TOKEN_LIFETIME,
     }
-    return jwt.encode(payload, _get_jwt_secret(), algorithm="HS256")
+    return jwt.encode(payload, _JWT_SECRET, algorithm="HS256")
+
+
+# Claims every token we issue carries; anything else is rejected outright.
+_DECODE_OPTIONS = {"require": ["exp", "user_id"], "verify_aud": False}
+
+
+def decode_token(token: str | bytes) -> dict:
+    return jwt.decode(token, _JWT_SECRET, algorithms=["HS256"], options=_DECODE_OPTIONS)
+
+
+# Verified payloads keyed by token hash. Entries live for at most 60s and never
+# past the token's own ``exp``, so a hit only needs to re-check expiry.
+_TOKEN_CACHE_TTL = 60
+
+
+def _token_ttu(_key: str, payload: dict, now: float) -> float:
+    return min(now + _TOKEN_CACHE_TTL, payload["exp"])
 
 
-def decode_token(token: str) -> dict:
-    return jwt.decode(token, _get_jwt_secret(), algorithms=["HS256"])
+_TOKEN_CACHE: TLRUCache = TLRUCache(maxsize=10000, ttu=_token_ttu, timer=time.time)
+
+
+def _verified_payload(token: bytes) -> dict:
+    """Return the decoded payload for *token*, skipping ``jwt.decode`` on a cache hit."""
+    key = hashlib.sha256(token).hexdigest()[:32]
+    payload = _TOKEN_CACHE.get(key)
+    if payload is not None:
+        if payload["exp"] <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+
+    # Invalid tokens raise here and are never cached
+    payload = decode_token(token)
+    _TOKEN_CACHE[key] = payload
+    return payload
 
 
 # ---------------------------------------------------------------------------
@@ -55,29 +157,44 @@ def decode_token(token: str) -> dict:
 
 async def get_current_user(request: Request) -> dict:
     """Extract and validate the Bearer token, return the full user dict."""
+    # Already resolved earlier in this request by another dependency
+    cached = getattr(request.state, "user", None)
+    if cached is not None:
+        return cached
+
     auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
+    scheme, _, token = auth_header.encode("latin-1").partition(b" ")
+    if not token or not hmac.compare_digest(scheme, b"Bearer"):
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    token = auth_header[7:]
     try:
-        payload = decode_token(token)
+        payload = _verified_payload(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.get_user_by_id(payload["user_id"])
+    # Supabase calls are blocking — keep them off the event loop
+    user = await asyncio.to_thread(db.get_session_user, payload["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     if not user.get("approved"):
         raise HTTPException(status_code=403, detail="Account pending admin approval")
 
+    request.state.user = user
     return user
 
 
-async def require_admin(user: dict = Depends(get_current_user)) -> dict:
-    """Require the current user to be an admin."""
-    if user.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return user
+def require_role(role: str):
+    """Build a dependency that requires the current user to have *role*."""
+    detail = f"{role.capitalize()} access required"
+
+    async def dependency(user: dict = Depends(get_current_user)) -> dict:
+        if user.get("role") != role:
+            raise HTTPException(status_code=403, detail=detail)
+        return user
+
+    return dependency
+
+
+require_admin = require_role("admin")
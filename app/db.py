@@ -3,26 +3,80 @@ from __future__ import annotations
 import io
 import logging
 import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO
 
+import orjson
+from cachetools import TLRUCache, TTLCache
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+
+from .state import get_redis
 
 logger = logging.getLogger(__name__)
 
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+
 _client: Client | None = None
+_client_lock = threading.Lock()
+
+# Short-lived user rows so every authenticated request doesn't re-fetch its user.
+# Writes through update_user/delete_user evict the entry immediately.
+_SESSION_USER_COLUMNS = "id, email, name, role, approved"
+_USER_CACHE: TTLCache = TTLCache(maxsize=5000, ttl=30)
+_user_cache_lock = threading.Lock()
+# Behind the local cache, rows are shared across workers in Redis when configured.
+_USER_REDIS_TTL = 30
+
+# Signed manual URLs are valid for a year and stable per storage path, so reuse
+# them for the first 80% of that window instead of re-signing on every view.
+_SIGNED_URL_LIFETIME = 365 * 24 * 60 * 60
+_SIGNED_URL_CACHE: TTLCache = TTLCache(maxsize=10000, ttl=int(_SIGNED_URL_LIFETIME * 0.8))
+_signed_url_lock = threading.Lock()
+
+
+# Product rows by normalized model number. Writes through this module update or
+# drop entries; "not in the library" is remembered for a shorter time so newly
+# added models show up quickly.
+_PRODUCT_CACHE_TTL = 300
+_PRODUCT_MISS_TTL = 60
+
+
+def _product_ttu(_key: str, product: dict | None, now: float) -> float:
+    return now + (_PRODUCT_CACHE_TTL if product is not None else _PRODUCT_MISS_TTL)
+
+
+_PRODUCT_CACHE: TLRUCache = TLRUCache(maxsize=10000, ttu=_product_ttu)
+_product_cache_lock = threading.Lock()
+_NOT_CACHED = object()
 
 
 def get_client() -> Client:
     """Return a singleton Supabase client."""
     global _client
     if _client is None:
-        load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
-        url = os.environ["SUPABASE_URL"]
-        key = os.environ["SUPABASE_KEY"]
-        _client = create_client(url, key)
+        with _client_lock:
+            if _client is None:
+                url = os.environ["SUPABASE_URL"]
+                key = os.environ["SUPABASE_KEY"]
+                options = ClientOptions(postgrest_client_timeout=10, storage_client_timeout=30)
+                _client = create_client(url, key, options=options)
     return _client
 
 
+def _reset_client_after_fork():
+    """Forked workers must not share the parent's sockets — build a fresh client."""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_after_fork)
+
+
 # ---------------------------------------------------------------------------
 # Users
 # ---------------------------------------------------------------------------
@@ -55,15 +109,69 @@ def get_user_by_id(user_id: str) -> dict | None:
     return resp.data
 
 
+def get_session_user(user_id: str) -> dict | None:
+    """Fetch the columns the auth dependency needs (no password_hash), cached briefly."""
+    with _user_cache_lock:
+        cached = _USER_CACHE.get(user_id)
+    if cached is not None:
+        return cached
+
+    row = _redis_get_user(user_id)
+    if row is None:
+        sb = get_client()
+        resp = sb.table("users").select(_SESSION_USER_COLUMNS).eq("id", user_id).maybe_single().execute()
+        if resp is None or not resp.data:
+            return None
+        row = resp.data
+        _redis_set_user(user_id, row)
+    with _user_cache_lock:
+        _USER_CACHE[user_id] = row
+    return row
+
+
+def _redis_get_user(user_id: str) -> dict | None:
+    r = get_redis()
+    if r is None:
+        return None
+    try:
+        raw = r.get(f"user:{user_id}")
+    except Exception as e:
+        logger.warning("Redis user lookup failed: %s", e)
+        return None
+    return orjson.loads(raw) if raw else None
+
+
+def _redis_set_user(user_id: str, row: dict):
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.set(f"user:{user_id}", orjson.dumps(row), ex=_USER_REDIS_TTL)
+    except Exception as e:
+        logger.warning("Redis user store failed: %s", e)
+
+
 def list_users() -> list[dict]:
     sb = get_client()
     resp = sb.table("users").select("id, email, name, role, approved, created_at").order("created_at", desc=True).execute()
     return resp.data or []
 
 
+def _evict_user(user_id: str):
+    with _user_cache_lock:
+        _USER_CACHE.pop(user_id, None)
+    r = get_redis()
+    if r is not None:
+        try:
+            r.delete(f"user:{user_id}")
+        except Exception as e:
+            logger.warning("Redis user eviction failed: %s", e)
+
+
 def update_user(user_id: str, data: dict) -> dict:
     sb = get_client()
     resp = sb.table("users").update(data).eq("id", user_id).execute()
+    _evict_user(user_id)
     if resp is None or not resp.data:
         return data
     return resp.data[0]
@@ -72,11 +180,13 @@ def update_user(user_id: str, data: dict) -> dict:
 def delete_user(user_id: str):
     sb = get_client()
     sb.table("users").delete().eq("id", user_id).execute()
+    _evict_user(user_id)
 
 
 def count_users() -> int:
     sb = get_client()
-    resp = sb.table("users").select("id", count="exact").execute()
+    # limit(0) returns an empty body; the exact count still comes back in Content-Range
+    resp = sb.table("users").select("id", count="exact").limit(0).execute()
     return resp.count if resp.count is not None else 0
 
 
@@ -120,13 +230,59 @@ def delete_project(project_id: str):
 # Product library (cached across all projects)
 # ---------------------------------------------------------------------------
 
+def _cache_products(rows: list[dict]):
+    with _product_cache_lock:
+        for row in rows:
+            if row.get("model_number"):
+                _PRODUCT_CACHE[row["model_number"]] = row
+
+
 def get_product_by_model(model_number: str) -> dict | None:
-    sb = get_client()
     model_number = model_number.strip().upper()
+    with _product_cache_lock:
+        cached = _PRODUCT_CACHE.get(model_number, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+
+    sb = get_client()
     resp = sb.table("products").select("*").eq("model_number", model_number).maybe_single().execute()
-    if resp is None:
-        return None
-    return resp.data
+    product = resp.data if resp is not None else None
+    with _product_cache_lock:
+        _PRODUCT_CACHE[model_number] = product
+    return product
+
+
+# in_() filters travel in the query string, so very large lookups are split to
+# stay well under proxy URL-length limits.
+_IN_FILTER_CHUNK = 200
+
+
+def get_products_by_models(models: list[str]) -> dict[str, dict]:
+    """Fetch many products at once (one query per 200 uncached models), keyed by normalized model number."""
+    keys = {m.strip().upper() for m in models if m}
+    found: dict[str, dict] = {}
+    missing: list[str] = []
+    with _product_cache_lock:
+        for key in keys:
+            cached = _PRODUCT_CACHE.get(key, _NOT_CACHED)
+            if cached is _NOT_CACHED:
+                missing.append(key)
+            elif cached is not None:
+                found[key] = cached
+    if not missing:
+        return found
+
+    sb = get_client()
+    fetched: dict[str, dict] = {}
+    for i in range(0, len(missing), _IN_FILTER_CHUNK):
+        chunk = missing[i:i + _IN_FILTER_CHUNK]
+        resp = sb.table("products").select("*").in_("model_number", chunk).execute()
+        fetched.update((r["model_number"], r) for r in (resp.data or []))
+    with _product_cache_lock:
+        for key in missing:
+            _PRODUCT_CACHE[key] = fetched.get(key)
+    found.update(fetched)
+    return found
 
 
 def upsert_product(data: dict) -> dict:
@@ -135,10 +291,38 @@ def upsert_product(data: dict) -> dict:
     resp = sb.table("products").upsert(data, on_conflict="model_number").execute()
     if resp is None or not resp.data:
         logger.error("upsert_product returned no data for %s", data.get("model_number"))
+        with _product_cache_lock:
+            _PRODUCT_CACHE.pop(data["model_number"], None)
         return data
+    _cache_products(resp.data)
     return resp.data[0]
 
 
+def bulk_upsert_products(rows: list[dict]) -> dict[str, dict]:
+    """Upsert many products in one request, returning stored rows keyed by model number.
+
+    Rows must share the same keys and be unique per model number — Postgres
+    rejects an upsert that touches the same row twice.
+    """
+    if not rows:
+        return {}
+    for row in rows:
+        row["model_number"] = row["model_number"].strip().upper()
+    sb = get_client()
+    resp = sb.table("products").upsert(rows, on_conflict="model_number").execute()
+    stored = resp.data or []
+    _cache_products(stored)
+    return {r["model_number"]: r for r in stored}
+
+
+def get_product(product_id: str, columns: str = "*") -> dict | None:
+    sb = get_client()
+    resp = sb.table("products").select(columns).eq("id", product_id).maybe_single().execute()
+    if resp is None:
+        return None
+    return resp.data
+
+
 def list_products(search: str | None = None) -> list[dict]:
     sb = get_client()
     query = sb.table("products").select("*").order("created_at", desc=True)
@@ -153,6 +337,10 @@ def update_product(product_id: str, data: dict) -> dict:
     if "model_number" in data and data["model_number"]:
         data["model_number"] = data["model_number"].strip().upper()
     resp = sb.table("products").update(data).eq("id", product_id).execute()
+    # Only the id is known here and the model number may have changed, so
+    # start the product cache over rather than guess which entry is stale.
+    with _product_cache_lock:
+        _PRODUCT_CACHE.clear()
     if resp is None or not resp.data:
         logger.error("update_product returned no data for %s", product_id)
         return data
@@ -163,6 +351,8 @@ def delete_product(product_id: str):
     sb = get_client()
     sb.table("project_items").update({"product_id": None}).eq("product_id", product_id).execute()
     sb.table("products").delete().eq("id", product_id).execute()
+    with _product_cache_lock:
+        _PRODUCT_CACHE.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -170,10 +360,8 @@ def delete_product(product_id: str):
 # ---------------------------------------------------------------------------
 
 def create_project_items(items: list[dict]) -> list[dict]:
+    # model_number is upper()/trim()'d by the project_items_normalize_model trigger
     sb = get_client()
-    for item in items:
-        if "model_number" in item and item["model_number"]:
-            item["model_number"] = item["model_number"].strip().upper()
     resp = sb.table("project_items").insert(items).execute()
     return resp.data or []
 
@@ -190,6 +378,21 @@ def get_project_items(project_id: str) -> list[dict]:
     return resp.data or []
 
 
+def get_project_item(item_id: str, columns: str = "*") -> dict | None:
+    sb = get_client()
+    resp = sb.table("project_items").select(columns).eq("id", item_id).maybe_single().execute()
+    if resp is None:
+        return None
+    return resp.data
+
+
+def get_project_model_numbers(project_id: str) -> set[str]:
+    """Normalized model numbers already in a project — one narrow column, no join."""
+    sb = get_client()
+    resp = sb.table("project_items").select("model_number").eq("project_id", project_id).execute()
+    return {r["model_number"].upper() for r in (resp.data or []) if r.get("model_number")}
+
+
 def update_project_item(item_id: str, data: dict) -> dict:
     sb = get_client()
     resp = sb.table("project_items").update(data).eq("id", item_id).execute()
@@ -199,6 +402,46 @@ def update_project_item(item_id: str, data: dict) -> dict:
     return resp.data[0]
 
 
+# The columns the background search writes back. Anything else on an item
+# (brand, notes typed by the user, ...) is left as it is in the database.
+_ITEM_RESULT_COLUMNS = ("status", "manual_url", "product_id", "notes")
+
+
+def bulk_update_project_items(items: list[dict]):
+    """Write search results back to many existing items in one request.
+
+    Each entry is ``{"id": ..., <result columns>}``; only the result columns
+    present are updated. Ids that no longer exist — items deleted while the
+    search ran — are skipped, never re-created (see bulk_update_project_items
+    in supabase_schema.sql).
+    """
+    if not items:
+        return
+    rows = [
+        {"id": item["id"], **{c: item[c] for c in _ITEM_RESULT_COLUMNS if c in item}}
+        for item in items
+    ]
+    sb = get_client()
+    sb.rpc("bulk_update_project_items", {"p_rows": rows}).execute()
+
+
+def apply_item_update(item_id: str, patch: dict) -> dict | None:
+    """Patch an item and return it joined with its product, in one round trip.
+
+    A non-empty ``manual_url`` in the patch is also recorded in the product
+    library and linked to the item (see apply_item_update in supabase_schema.sql).
+    Returns None if the item doesn't exist.
+    """
+    sb = get_client()
+    resp = sb.rpc("apply_item_update", {"p_item_id": item_id, "p_patch": patch}).execute()
+    if resp is None or not resp.data:
+        return None
+    item = resp.data[0]
+    if item.get("products"):
+        _cache_products([item["products"]])
+    return item
+
+
 def delete_project_item(item_id: str):
     sb = get_client()
     sb.table("project_items").delete().eq("id", item_id).execute()
@@ -214,20 +457,125 @@ def delete_project_items(item_ids: list[str]):
 # Supabase Storage (manuals bucket)
 # ---------------------------------------------------------------------------
 
-def upload_manual(pdf_bytes: bytes, storage_path: str) -> str:
+def upload_manual(pdf: bytes | BinaryIO | str | os.PathLike, storage_path: str) -> str:
+    """Upload a manual PDF. Pass a path or an open file to stream it from disk."""
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as fh:
+            return upload_manual(fh, storage_path)
+    if not isinstance(pdf, (bytes, io.BufferedReader, io.FileIO)):
+        # storage3 only streams real files; other file-likes are read in full
+        pdf = pdf.read()
+
     sb = get_client()
     sb.storage.from_("manuals").upload(
         path=storage_path,
-        file=pdf_bytes,
+        file=pdf,
         file_options={"content-type": "application/pdf", "upsert": "true"},
     )
     return storage_path
 
 
 def get_manual_url(storage_path: str) -> str:
+    with _signed_url_lock:
+        cached = _SIGNED_URL_CACHE.get(storage_path)
+    if cached:
+        return cached
+
     sb = get_client()
-    resp = sb.storage.from_("manuals").create_signed_url(storage_path, 365 * 24 * 60 * 60)
+    resp = sb.storage.from_("manuals").create_signed_url(storage_path, _SIGNED_URL_LIFETIME)
     # Handle both possible key names from different SDK versions
+    url = ""
     if isinstance(resp, dict):
-        return resp.get("signedURL") or resp.get("signedUrl") or ""
-    return ""
+        url = resp.get("signedURL") or resp.get("signedUrl") or ""
+    if url:
+        with _signed_url_lock:
+            _SIGNED_URL_CACHE[storage_path] = url
+    return url
+
+
+def get_manual_urls(storage_paths: list[str]) -> dict[str, str]:
+    """Signed URLs for many storage paths, signing all cache misses in one request."""
+    urls: dict[str, str] = {}
+    missing: list[str] = []
+    with _signed_url_lock:
+        for path in dict.fromkeys(storage_paths):
+            cached = _SIGNED_URL_CACHE.get(path)
+            if cached:
+                urls[path] = cached
+            else:
+                missing.append(path)
+    if not missing:
+        return urls
+
+    sb = get_client()
+    try:
+        signed = sb.storage.from_("manuals").create_signed_urls(missing, _SIGNED_URL_LIFETIME)
+    except Exception as e:
+        # storage3 fails the whole batch if any object is gone — sign one by one
+        logger.warning("Bulk URL signing failed, falling back per path: %s", e)
+        for path in missing:
+            try:
+                url = get_manual_url(path)
+            except Exception:
+                continue
+            if url:
+                urls[path] = url
+        return urls
+
+    fresh = {
+        entry["path"]: entry["signedURL"]
+        for entry in signed
+        if entry.get("path") and entry.get("signedURL")
+    }
+    with _signed_url_lock:
+        _SIGNED_URL_CACHE.update(fresh)
+    urls.update(fresh)
+    return urls
+
+
+# ---------------------------------------------------------------------------
+# Finished bulk-download ZIPs (multi-worker deployments)
+# ---------------------------------------------------------------------------
+# Parked in the manuals bucket so whichever worker gets the file request can
+# serve a ZIP another worker built. Read back through short-lived signed URLs.
+
+_DOWNLOADS_PREFIX = "downloads"
+_DOWNLOAD_URL_LIFETIME = 10 * 60
+
+
+def upload_download_zip(path: str | os.PathLike, job_id: str) -> str:
+    storage_path = f"{_DOWNLOADS_PREFIX}/{job_id}.zip"
+    sb = get_client()
+    with open(path, "rb") as fh:
+        sb.storage.from_("manuals").upload(
+            path=storage_path,
+            file=fh,
+            file_options={"content-type": "application/zip", "upsert": "true"},
+        )
+    return storage_path
+
+
+def get_download_zip_url(storage_path: str) -> str:
+    sb = get_client()
+    resp = sb.storage.from_("manuals").create_signed_url(storage_path, _DOWNLOAD_URL_LIFETIME)
+    return resp.get("signedURL") or resp.get("signedUrl") or ""
+
+
+def delete_download_zip(storage_path: str):
+    sb = get_client()
+    sb.storage.from_("manuals").remove([storage_path])
+
+
+def remove_stale_download_zips(max_age: int):
+    """Delete parked ZIPs older than *max_age* seconds that nobody collected."""
+    sb = get_client()
+    bucket = sb.storage.from_("manuals")
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+    entries = bucket.list(_DOWNLOADS_PREFIX, {"limit": 1000})
+    stale = [
+        f"{_DOWNLOADS_PREFIX}/{e['name']}"
+        for e in entries
+        if e.get("created_at") and datetime.fromisoformat(e["created_at"].replace("Z", "+00:00")) < cutoff
+    ]
+    if stale:
+        bucket.remove(stale)
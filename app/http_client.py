@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ---------------------------------------------------------------------------
+# Shared outbound HTTP session
+# ---------------------------------------------------------------------------
+# One keep-alive pool for every outbound fetch (search pages, manufacturer
+# sites, PDF downloads) so repeat hosts skip the TCP + TLS handshake. Sized for
+# the concurrent manual searches. Connection errors and throttling/gateway
+# statuses are retried twice with a short backoff (honouring Retry-After, up
+# to a few seconds); once retries run out the last response is returned as-is
+# for callers to check.
+
+class _CappedRetry(Retry):
+    """Retry that honours Retry-After only up to a few seconds.
+
+    A server asking for an hour (or a date far ahead) would otherwise park the
+    calling search thread, and any download slot it holds, for that long.
+    """
+
+    MAX_RETRY_AFTER = 5.0
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.MAX_RETRY_AFTER)
+
+
+HTTP = requests.Session()
+# Manufacturer sites and the DuckDuckGo HTML endpoint turn away the default
+# python-requests agent, so every request presents as a desktop browser
+HTTP.headers["User-Agent"] = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+_adapter = HTTPAdapter(
+    pool_connections=64,
+    pool_maxsize=64,
+    max_retries=_CappedRetry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    ),
+)
+HTTP.mount("http://", _adapter)
+HTTP.mount("https://", _adapter)
+
+# Forked workers must not share the parent's sockets; pools rebuild on demand
+os.register_at_fork(after_in_child=HTTP.close)
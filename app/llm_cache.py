@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Content-addressed cache of Claude replies
+# ---------------------------------------------------------------------------
+# Keyed by a hash of everything that shapes the reply, so the same prompt and
+# input (a re-exported contract, a retried upload) skip the model call. Stored
+# as files so every worker process on the host shares them.
+
+# Bump to retire every cached reply after a prompt or output-format change
+PROMPT_VERSION = "v1"
+
+_CACHE_DIR = Path(os.environ.get("LLM_CACHE_DIR") or Path.home() / ".cache" / "ati" / "llm")
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _cache_path(model: str, system: str, user: str, max_tokens: int) -> Path:
+    key = hashlib.sha256(orjson.dumps(
+        {"v": PROMPT_VERSION, "m": model, "s": system, "u": user, "t": max_tokens},
+        option=orjson.OPT_SORT_KEYS,
+    )).hexdigest()
+    return _CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def _count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats() -> dict[str, int]:
+    """Hit/miss counts for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _write_entry(path: Path, entry: dict):
+    """Write via a temp file and rename, so readers never see a partial entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(orjson.dumps(entry))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def cached_message(client, *, model: str, system: str, user: str, max_tokens: int) -> str:
+    """Text of Claude's reply to a single user message, from the cache when possible."""
+    path = _cache_path(model, system, user, max_tokens)
+    try:
+        text = orjson.loads(path.read_bytes())["text"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable LLM cache entry %s: %s", path.name, e)
+    else:
+        _count("hits")
+        logger.info("LLM cache hit (%s)", path.stem[:12])
+        return text
+
+    _count("misses")
+    response = client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": user}],
+    )
+    text = response.content[0].text
+
+    # A reply cut off at max_tokens is incomplete; don't pin it
+    if response.stop_reason == "end_turn":
+        try:
+            _write_entry(path, {"model": model, "text": text})
+        except OSError as e:
+            logger.warning("Could not write LLM cache entry: %s", e)
+    return text
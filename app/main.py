@@ -1,29 +1,37 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import hashlib
+import hmac
 import logging
+import multiprocessing
 import os
+import tempfile
 import threading
+import time
 import uuid
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta, timezone
 
-import requests as requests_lib
-from dotenv import load_dotenv
+import orjson
+from cachetools import TTLCache
 from fastapi import BackgroundTasks, Body, Depends, FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
+from starlette.background import BackgroundTask
 
 from . import db
-from .auth import get_current_user, require_admin, hash_password, verify_password, create_token
+from .auth import get_current_user, require_admin, ahash_password, averify_password, password_needs_rehash, create_token
+from .http_client import HTTP
 from .manual_finder import find_manual_and_warranty, download_pdf_from_url
-from .pdf_parser import parse_products_from_pdf
-
-# Load environment variables early
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+from .pdf_parser import count_pdf_pages, extract_text_from_pdf, parse_products_from_text
+from .singleflight import with_singleflight
+from .state import JobStore, get_redis
 
 logging.basicConfig(
     level=logging.INFO,
@@ -31,132 +39,293 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ati")
 
-app = FastAPI(title="ATI Manual Finder")
+app = FastAPI(title="ATI Manual Finder", default_response_class=ORJSONResponse)
 
 # ---------------------------------------------------------------------------
-# In-memory progress tracker
+# Progress tracker (shared across workers when REDIS_URL is set)
 # ---------------------------------------------------------------------------
-_progress: dict[str, dict] = {}
-_download_jobs: dict[str, dict] = {}
+_progress = JobStore("progress", ttl=24 * 3600)
+_download_jobs = JobStore("download", ttl=3600)
+
+
+def _discard_temp_file(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _ZipFileCache(TTLCache):
+    """Finished-ZIP index whose expired or evicted entries take their temp file along."""
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _, download in expired:
+            _discard_temp_file(download["file_path"])
+        return expired
+
+    def popitem(self):
+        key, download = super().popitem()
+        _discard_temp_file(download["file_path"])
+        return key, download
+
+
+# Finished ZIPs are temp files local to the process that built them, keyed by
+# job id. Bounded so ZIPs nobody collects don't pile up on disk.
+_download_files = _ZipFileCache(maxsize=256, ttl=3600)
+_download_files_lock = threading.Lock()
 
 
 # ---------------------------------------------------------------------------
 # Background worker
 # ---------------------------------------------------------------------------
 
+def _search_manual(item: dict) -> dict:
+    """find_manual_and_warranty for a project item, shared with any identical search in flight."""
+    return with_singleflight(
+        item["model_number"].strip().upper(),
+        lambda: find_manual_and_warranty(
+            item.get("brand", ""), item["model_number"], item.get("product_name", ""),
+        ),
+    )
+
+
+def _upload_found_manual(project_id: str, brand: str, model: str, pdf_bytes: bytes) -> tuple[str, str]:
+    """Store a manual PDF found by the web search; returns (storage_path, signed_url)."""
+    safe_brand = (brand or "unknown").replace(" ", "_")
+    storage_path = f"{project_id}/{safe_brand}_{model}_manual.pdf"
+    db.upload_manual(pdf_bytes, storage_path)
+    return storage_path, db.get_manual_url(storage_path)
+
+
+# Finished items are written back in batches rather than one request (plus a
+# product upsert) per item — but at least this often, since the project page
+# draws its progress from the stored item statuses.
+_FLUSH_EVERY = 50
+_FLUSH_INTERVAL = 1.5
+
+# Web searches are network-bound, so several run at once per project.
+_SEARCH_CONCURRENCY = int(os.getenv("MANUAL_SEARCH_CONCURRENCY", "8"))
+# Found PDFs are uploaded to storage on their own pool
+_UPLOAD_CONCURRENCY = 4
+_UPLOAD_TIMEOUT = 60
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """A timestamptz as PostgREST returns it, whatever its offset or fraction digits.
+
+    Unreadable values count as long ago.
+    """
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
 def _process_project(project_id: str, total: int):
     """Process all pending items for a project (runs in background thread)."""
+    # Buffered writes: only the result columns of each item (see
+    # db.bulk_update_project_items). Items that need the id of a product
+    # upserted in the same batch are tagged with its model number.
+    product_rows: dict[str, dict] = {}
+    item_rows: list[tuple[dict, str | None]] = []
+    last_flush = time.monotonic()
+    # Items written so far; it moves whenever results reach the database, so
+    # the progress stream tells the project page when to re-read its items
+    saved = 0
+    message = "Starting..."
+
+    def report(text: str):
+        nonlocal message
+        message = text
+        _progress[project_id] = {"message": text, "done": False, "error": None, "saved": saved}
+
+    def flush():
+        nonlocal last_flush, saved
+        last_flush = time.monotonic()
+        if not item_rows:
+            return
+        try:
+            stored = db.bulk_upsert_products(list(product_rows.values()))
+            for row, model_key in item_rows:
+                product = stored.get(model_key) if model_key else None
+                if product and product.get("id"):
+                    row["product_id"] = product["id"]
+            db.bulk_update_project_items([row for row, _ in item_rows])
+        except Exception as e:
+            logger.error("Batch write failed for project %s: %s", project_id, e, exc_info=True)
+            for row, _ in item_rows:
+                try:
+                    db.update_project_item(row["id"], {"status": "not_found", "notes": f"Error: {e}"})
+                except Exception:
+                    pass
+        saved += len(item_rows)
+        product_rows.clear()
+        item_rows.clear()
+        report(message)
+
+    def flush_if_due():
+        if len(item_rows) >= _FLUSH_EVERY or time.monotonic() - last_flush >= _FLUSH_INTERVAL:
+            flush()
+
+    def queue_item(row: dict, model_key: str | None = None):
+        item_rows.append((row, model_key))
+        flush_if_due()
+
     try:
         items = db.get_project_items(project_id)
         pending = [i for i in items if i["status"] == "pending"]
         logger.info("Starting processing for project %s — %d items", project_id, len(pending))
 
+        # One lookup for the whole batch instead of a round-trip per item
+        library = db.get_products_by_models([i["model_number"] for i in pending])
+
+        # Pass 1: resolve what the product library already answers
+        report("Checking product library...")
+        to_search: list[tuple[int, dict, dict]] = []
+        recent_cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+
         for idx, item in enumerate(pending, 1):
             brand = item.get("brand", "")
             model = item["model_number"]
-            name = item.get("product_name", "")
+            link_data = {}
 
-            _progress[project_id] = {
-                "message": f"Searching {idx}/{total}: {brand} {model}",
-                "done": False,
-                "error": None,
-            }
+            cached = library.get(model.strip().upper())
+            if cached:
+                link_data["product_id"] = cached["id"]
 
-            try:
-                # Check product library cache first
-                cached = db.get_product_by_model(model)
-                if cached:
-                    link_data = {"product_id": cached["id"]}
-
-                    if cached.get("manual_source_url"):
-                        # FULL CACHE HIT — manual exists in library
-                        logger.info("[%d/%d] Cache hit (full): %s %s", idx, total, brand, model)
-                        manual_url = None
-                        if cached.get("manual_storage_path"):
-                            try:
-                                manual_url = db.get_manual_url(cached["manual_storage_path"])
-                            except Exception:
-                                manual_url = cached.get("manual_source_url")
-                        link_data["status"] = "found"
-                        link_data["manual_url"] = manual_url or cached.get("manual_source_url")
-                        db.update_project_item(item["id"], link_data)
-                        continue
-
-                    # Check if recently verified as not_found (within 7 days)
-                    last_verified = cached.get("last_verified")
-                    if last_verified:
+                if cached.get("manual_source_url"):
+                    # FULL CACHE HIT — manual exists in library
+                    logger.info("[%d/%d] Cache hit (full): %s %s", idx, total, brand, model)
+                    manual_url = None
+                    if cached.get("manual_storage_path"):
                         try:
-                            lv = datetime.fromisoformat(str(last_verified).replace("Z", "+00:00"))
-                            if lv > datetime.now(timezone.utc) - timedelta(days=7):
-                                logger.info("[%d/%d] Cache hit (recent not_found): %s %s", idx, total, brand, model)
-                                link_data["status"] = "not_found"
-                                link_data["notes"] = "Previously searched (cached)"
-                                db.update_project_item(item["id"], link_data)
-                                continue
+                            manual_url = db.get_manual_url(cached["manual_storage_path"])
                         except Exception:
-                            pass
-
-                    # Partial cache — re-search
-                    logger.info("[%d/%d] Partial cache (re-searching): %s %s", idx, total, brand, model)
-                    db.update_project_item(item["id"], link_data)
-
-                # Web search
-                logger.info("[%d/%d] Searching web: %s %s", idx, total, brand, model)
-                result = find_manual_and_warranty(brand, model, name)
-                logger.info(
-                    "[%d/%d] Result: status=%s, manual_url=%s",
-                    idx, total, result["status"],
-                    result.get("manual_source_url", "none"),
-                )
+                            manual_url = cached.get("manual_source_url")
+                    link_data["status"] = "found"
+                    link_data["manual_url"] = manual_url or cached.get("manual_source_url")
+                    queue_item({"id": item["id"], **link_data})
+                    continue
+
+                # Check if recently verified as not_found (within 7 days)
+                last_verified = cached.get("last_verified")
+                if last_verified and _parse_timestamp(last_verified) > recent_cutoff:
+                    logger.info("[%d/%d] Cache hit (recent not_found): %s %s", idx, total, brand, model)
+                    link_data["status"] = "not_found"
+                    link_data["notes"] = "Previously searched (cached)"
+                    queue_item({"id": item["id"], **link_data})
+                    continue
+
+                # Partial cache — re-search
+                logger.info("[%d/%d] Partial cache (re-searching): %s %s", idx, total, brand, model)
+
+            to_search.append((idx, item, link_data))
+        flush()
+
+        def record_result(item: dict, link_data: dict, result: dict, storage_path: str | None, manual_url: str | None):
+            brand = item.get("brand", "")
+            model = item["model_number"]
 
-                storage_path = None
-                manual_url = None
-
-                if result["manual_pdf_bytes"]:
-                    safe_brand = (brand or "unknown").replace(" ", "_")
-                    storage_path = f"{project_id}/{safe_brand}_{model}_manual.pdf"
-                    try:
-                        db.upload_manual(result["manual_pdf_bytes"], storage_path)
-                        manual_url = db.get_manual_url(storage_path)
-                        logger.info("[%d/%d] Uploaded manual to storage: %s", idx, total, storage_path)
-                    except Exception as e:
-                        logger.warning("[%d/%d] Storage upload failed: %s", idx, total, e)
-                        manual_url = result.get("manual_source_url")
-
-                # Upsert product library — prefer Supabase signed URL over original website URL
-                product = db.upsert_product({
-                    "brand": brand,
-                    "model_number": model,
-                    "product_name": name,
-                    "manual_source_url": manual_url or result.get("manual_source_url"),
-                    "manual_storage_path": storage_path,
-                    "last_verified": datetime.now(timezone.utc).isoformat(),
-                })
-
-                # Update project item
-                update_data = {
-                    "status": result["status"],
-                    "manual_url": manual_url or result.get("manual_source_url"),
-                }
-                if product.get("id"):
-                    update_data["product_id"] = product["id"]
-                db.update_project_item(item["id"], update_data)
+            # Queue the product library upsert — prefer Supabase signed URL over original website URL
+            model_key = model.strip().upper()
+            product_rows[model_key] = {
+                "brand": brand,
+                "model_number": model,
+                "product_name": item.get("product_name", ""),
+                "manual_source_url": manual_url or result.get("manual_source_url"),
+                "manual_storage_path": storage_path,
+                "last_verified": datetime.now(timezone.utc).isoformat(),
+            }
 
-            except Exception as e:
-                logger.error("[%d/%d] Failed to process %s %s: %s", idx, total, brand, model, e, exc_info=True)
+            # Queue the project item update; product_id is filled in at flush
+            link_data["status"] = result["status"]
+            link_data["manual_url"] = manual_url or result.get("manual_source_url")
+            queue_item({"id": item["id"], **link_data}, model_key)
+
+        # Uploads submitted but not yet recorded
+        uploads: list[tuple[Future, int, dict, dict, dict]] = []
+
+        def collect_uploads(drain: bool):
+            running = []
+            for upload, idx, item, link_data, result in uploads:
+                if not drain and not upload.done():
+                    running.append((upload, idx, item, link_data, result))
+                    continue
                 try:
-                    db.update_project_item(item["id"], {
-                        "status": "not_found",
-                        "notes": f"Error: {e}",
-                    })
-                except Exception:
-                    pass
+                    storage_path, manual_url = upload.result(timeout=_UPLOAD_TIMEOUT)
+                    logger.info("[%d/%d] Uploaded manual to storage: %s", idx, total, storage_path)
+                except Exception as e:
+                    logger.warning("[%d/%d] Storage upload failed: %s", idx, total, e)
+                    storage_path, manual_url = None, result.get("manual_source_url")
+                record_result(item, link_data, result, storage_path, manual_url)
+            uploads[:] = running
+
+        # Pass 2: web searches run concurrently and found PDFs are uploaded on
+        # a second pool, so searching and uploading overlap. Results are
+        # handled here, on this thread, as they finish — so the write buffers
+        # and _progress are only ever touched from one thread.
+        with ThreadPoolExecutor(max_workers=_UPLOAD_CONCURRENCY, thread_name_prefix="upload") as uploader, \
+                ThreadPoolExecutor(max_workers=_SEARCH_CONCURRENCY, thread_name_prefix="search") as pool:
+            futures = {}
+            for idx, item, link_data in to_search:
+                logger.info("[%d/%d] Searching web: %s %s", idx, total, item.get("brand", ""), item["model_number"])
+                fut = pool.submit(_search_manual, item)
+                futures[fut] = (idx, item, link_data)
+
+            def handle_search(fut: Future, done: int):
+                idx, item, link_data = futures[fut]
+                brand = item.get("brand", "")
+                model = item["model_number"]
+
+                report(f"Searched {done}/{len(to_search)}: {brand} {model}")
 
+                try:
+                    result = fut.result()
+                    logger.info(
+                        "[%d/%d] Result: status=%s, manual_url=%s",
+                        idx, total, result["status"],
+                        result.get("manual_source_url", "none"),
+                    )
+
+                    if result["manual_pdf_bytes"]:
+                        upload = uploader.submit(
+                            _upload_found_manual, project_id, brand, model, result["manual_pdf_bytes"],
+                        )
+                        # Results can be shared with other searches (singleflight),
+                        # so copy rather than mutate to drop the PDF reference
+                        summary = {k: v for k, v in result.items() if k != "manual_pdf_bytes"}
+                        uploads.append((upload, idx, item, link_data, summary))
+                    else:
+                        record_result(item, link_data, result, None, None)
+
+                except Exception as e:
+                    logger.error("[%d/%d] Failed to process %s %s: %s", idx, total, brand, model, e, exc_info=True)
+                    queue_item({"id": item["id"], "status": "not_found", "notes": f"Error: {e}"})
+
+            # Woken at least every _FLUSH_INTERVAL, so finished items reach the
+            # database promptly even while the next searches are slow
+            searching = set(futures)
+            done = 0
+            while searching:
+                finished, searching = wait(searching, timeout=_FLUSH_INTERVAL, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done += 1
+                    handle_search(fut, done)
+                collect_uploads(drain=False)
+                flush_if_due()
+
+            collect_uploads(drain=True)
+
+        flush()
         _progress[project_id] = {"message": "Complete!", "done": True, "error": None}
         logger.info("Processing complete for project %s", project_id)
 
     except Exception as e:
         logger.error("Worker crashed for project %s: %s", project_id, e, exc_info=True)
+        # Keep whatever finished before the crash
+        flush()
         _progress[project_id] = {"message": str(e), "done": True, "error": str(e)}
 
 
@@ -201,7 +370,7 @@ async def register(data: dict):
         approved = False
         message = "Account created. Waiting for admin approval."
 
-    password_hash = hash_password(password)
+    password_hash = await ahash_password(password)
     user = db.create_user(email=email, password_hash=password_hash, name=name, role=role, approved=approved)
 
     return {
@@ -223,12 +392,19 @@ async def login(data: dict):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    if not verify_password(password, user["password_hash"]):
+    if not await averify_password(email, password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     if not user.get("approved"):
         raise HTTPException(status_code=403, detail="Account pending admin approval")
 
+    # Lazily migrate the stored hash when BCRYPT_ROUNDS has changed
+    if password_needs_rehash(user["password_hash"]):
+        try:
+            db.update_user(user["id"], {"password_hash": await ahash_password(password)})
+        except Exception as e:
+            logger.warning("Password rehash failed for user %s: %s", user["id"], e)
+
     token = create_token(user["id"], user["role"])
     return {
         "token": token,
@@ -263,10 +439,12 @@ async def change_password(data: dict, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="New password must be at least 6 characters")
 
     full_user = db.get_user_by_id(user["id"])
-    if not full_user or not verify_password(current_password, full_user["password_hash"]):
+    if not full_user or not await averify_password(
+        full_user["email"], current_password, full_user["password_hash"]
+    ):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
-    new_hash = hash_password(new_password)
+    new_hash = await ahash_password(new_password)
     db.update_user(user["id"], {"password_hash": new_hash})
     return {"status": "ok", "message": "Password updated successfully"}
 
@@ -312,7 +490,7 @@ async def admin_reset_password(user_id: str, data: dict, user: dict = Depends(re
     if not target:
         raise HTTPException(status_code=404, detail="User not found")
 
-    new_hash = hash_password(new_password)
+    new_hash = await ahash_password(new_password)
     db.update_user(user_id, {"password_hash": new_hash})
     return {"status": "ok", "message": "Password reset successfully"}
 
@@ -326,7 +504,9 @@ async def _check_project_access(project_id: str, user: dict):
     if user["role"] == "admin":
         return
     project = db.get_project(project_id)
-    if not project or project.get("user_id") != user["id"]:
+    if not project or not hmac.compare_digest(
+        str(project.get("user_id") or "").encode(), str(user["id"]).encode()
+    ):
         raise HTTPException(status_code=403, detail="Access denied")
 
 
@@ -341,6 +521,83 @@ async def list_projects(user: dict = Depends(get_current_user)):
     return db.list_projects(user_id=user["id"])
 
 
+_UPLOAD_CHUNK = 1024 * 1024
+
+
+async def _spool_upload(file: UploadFile) -> tuple[str, str]:
+    """Copy an uploaded PDF to a temp file chunk by chunk.
+
+    Returns the file's path and a hash of its content, computed on the way
+    through. The caller owns the file and must unlink it.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(_UPLOAD_CHUNK):
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, hasher.hexdigest()
+
+
+# Parsed product lists by contract content hash, so re-uploading the same PDF
+# (change orders, retries, duplicate submissions) skips extraction and Claude
+_parse_cache = JobStore("pdfparse", ttl=30 * 24 * 3600)
+
+
+# Contract text extraction (PDFium, pdfplumber as fallback) runs in worker
+# processes so it neither blocks the event loop nor competes for the GIL with
+# the background search threads; the Claude call that follows is I/O and runs
+# on a thread. Created on first use; spawned, not forked, so the children
+# don't inherit this process's threads and open connections.
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=max(2, (os.cpu_count() or 2) // 2),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pdf_pool
+
+
+# Long contracts are split into runs of this many pages, extracted side by side
+# across the pool; text extraction is the CPU-bound part of a parse
+_PAGES_PER_TASK = 8
+
+
+async def _extract_contract_text(pdf_path: str) -> str:
+    loop = asyncio.get_running_loop()
+    pool = _get_pdf_pool()
+    n_pages = await loop.run_in_executor(pool, count_pdf_pages, pdf_path)
+    texts = await asyncio.gather(*(
+        loop.run_in_executor(pool, extract_text_from_pdf, pdf_path, start, start + _PAGES_PER_TASK)
+        for start in range(0, n_pages, _PAGES_PER_TASK)
+    ))
+    return "\n".join(t for t in texts if t)
+
+
+async def _parse_contract(pdf_path: str, digest: str) -> list[dict]:
+    cached = _parse_cache.get(digest)
+    if cached is not None:
+        logger.info("Parse cache hit for contract %s", digest)
+        return cached["products"]
+
+    products = await asyncio.to_thread(parse_products_from_text, await _extract_contract_text(pdf_path))
+    # An empty result is more likely a bad parse than a real answer — retry it next time
+    if products:
+        _parse_cache[digest] = {"products": products}
+    return products
+
+
 @app.post("/api/projects/upload")
 async def upload_project(
     background_tasks: BackgroundTasks,
@@ -351,15 +608,19 @@ async def upload_project(
     if user["role"] == "admin":
         raise HTTPException(status_code=403, detail="Admin accounts cannot create projects")
 
-    pdf_bytes = await file.read()
-    logger.info("Uploading project '%s', PDF size: %d bytes", project_name, len(pdf_bytes))
+    pdf_path, digest = await _spool_upload(file)
+    try:
+        logger.info("Uploading project '%s', PDF size: %d bytes", project_name, os.path.getsize(pdf_path))
 
-    # Parse products from PDF
-    products = parse_products_from_pdf(pdf_bytes)
+        # Parse products from PDF
+        products = await _parse_contract(pdf_path, digest)
+    finally:
+        os.unlink(pdf_path)
     logger.info("Extracted %d products from PDF", len(products))
 
-    # Create project with user_id
-    project = db.create_project(name=project_name, user_id=user["id"])
+    # Create project with user_id. The Supabase client is synchronous, so the
+    # writes run on a worker thread rather than stalling the event loop.
+    project = await asyncio.to_thread(db.create_project, name=project_name, user_id=user["id"])
     project_id = project["id"]
 
     # Create project items
@@ -375,7 +636,7 @@ async def upload_project(
         for p in products
     ]
     if items:
-        db.create_project_items(items)
+        await asyncio.to_thread(db.create_project_items, items)
 
     # Initialize progress
     _progress[project_id] = {"message": "Starting...", "done": False, "error": None}
@@ -416,19 +677,21 @@ async def add_items_to_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    pdf_bytes = await file.read()
-    logger.info("Adding items to project '%s', PDF size: %d bytes", project["name"], len(pdf_bytes))
+    pdf_path, digest = await _spool_upload(file)
+    try:
+        logger.info("Adding items to project '%s', PDF size: %d bytes", project["name"], os.path.getsize(pdf_path))
 
-    # Parse products from PDF
-    products = parse_products_from_pdf(pdf_bytes)
+        # Parse products from PDF
+        products = await _parse_contract(pdf_path, digest)
+    finally:
+        os.unlink(pdf_path)
     logger.info("Extracted %d products from additional PDF", len(products))
 
     if not products:
         return {"project_id": project_id, "product_count": 0, "products": []}
 
     # Deduplicate against existing items in this project
-    existing_items = db.get_project_items(project_id)
-    existing_models = {i["model_number"].upper() for i in existing_items if i.get("model_number")}
+    existing_models = await asyncio.to_thread(db.get_project_model_numbers, project_id)
 
     new_products = [p for p in products if p["model_number"].upper() not in existing_models]
     logger.info("After dedup: %d new products (skipped %d duplicates)", len(new_products), len(products) - len(new_products))
@@ -448,7 +711,7 @@ async def add_items_to_project(
         }
         for p in new_products
     ]
-    db.create_project_items(items)
+    await asyncio.to_thread(db.create_project_items, items)
 
     # Initialize/update progress
     _progress[project_id] = {"message": "Starting...", "done": False, "error": None}
@@ -475,8 +738,49 @@ async def delete_project(project_id: str, user: dict = Depends(get_current_user)
 @app.get("/api/projects/{project_id}/progress")
 async def get_progress(project_id: str, user: dict = Depends(get_current_user)):
     await _check_project_access(project_id, user)
-    return _progress.get(
-        project_id, {"message": "Not started", "done": True, "error": None}
+    # Polled every second; the store read can be a Redis round trip, so it
+    # stays off the event loop. Returned as a response so the plain dict
+    # skips FastAPI's jsonable_encoder pass.
+    progress = await asyncio.to_thread(_progress.get, project_id)
+    return ORJSONResponse(progress or {"message": "Not started", "done": True, "error": None})
+
+
+# How often the progress stream re-reads the store, and how long it may stay
+# silent before sending a keep-alive comment so proxies don't drop it
+_PROGRESS_STREAM_INTERVAL = 1.0
+_PROGRESS_STREAM_KEEPALIVE = 15.0
+
+
+@app.get("/api/projects/{project_id}/progress/stream")
+async def stream_progress(project_id: str, user: dict = Depends(get_current_user)):
+    """Server-Sent Events form of /progress: access is checked once, then each change is pushed.
+
+    Read with fetch() rather than EventSource, which can't send the bearer token.
+    """
+    await _check_project_access(project_id, user)
+
+    async def events():
+        last = None
+        idle = 0.0
+        while True:
+            progress = await asyncio.to_thread(_progress.get, project_id)
+            progress = progress or {"message": "Not started", "done": True, "error": None}
+            if progress != last:
+                yield f"data: {orjson.dumps(progress).decode()}\n\n"
+                if progress.get("done"):
+                    return
+                last = progress
+                idle = 0.0
+            elif idle >= _PROGRESS_STREAM_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(_PROGRESS_STREAM_INTERVAL)
+            idle += _PROGRESS_STREAM_INTERVAL
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -519,64 +823,41 @@ async def update_item(item_id: str, data: dict, background_tasks: BackgroundTask
     if "manual_url" in data and data["manual_url"]:
         data.setdefault("status", "manual_entry")
 
-    # Update the project item
-    updated_item = db.update_project_item(item_id, data) if data else {}
+    # Update the item and, for a pasted manual URL, the products table (cache)
+    # so future projects get a cache hit — returned joined with its product
+    item = db.apply_item_update(item_id, data)
+    if not item:
+        return data
 
-    # Also update the products table (cache) so future projects get a cache hit
+    # Trigger background PDF download from pasted URL
     manual_url = data.get("manual_url")
     if manual_url:
-        sb = db.get_client()
-        resp = sb.table("project_items").select("*").eq("id", item_id).maybe_single().execute()
-        if resp and resp.data:
-            item = resp.data
-            model_number = item.get("model_number")
-            if model_number:
-                product_data = {
-                    "model_number": model_number,
-                    "brand": item.get("brand"),
-                    "product_name": item.get("product_name"),
-                    "manual_source_url": manual_url,
-                    "last_verified": datetime.now(timezone.utc).isoformat(),
-                }
-
-                product = db.upsert_product(product_data)
+        background_tasks.add_task(
+            _download_manual_from_url,
+            item_id,
+            manual_url,
+            item.get("brand", ""),
+            item.get("model_number", ""),
+            item.get("project_id", ""),
+        )
 
-                # Link the project item to the product
-                if product.get("id"):
-                    db.update_project_item(item_id, {"product_id": product["id"]})
+    return item
 
-            # Trigger background PDF download from pasted URL
-            background_tasks.add_task(
-                _download_manual_from_url,
-                item_id,
-                manual_url,
-                item.get("brand", ""),
-                item.get("model_number", ""),
-                item.get("project_id", ""),
-            )
 
-    # Return item with product join
-    sb = db.get_client()
-    final = sb.table("project_items").select("*, products(*)").eq("id", item_id).maybe_single().execute()
-    return final.data if final and final.data else updated_item
+# The item fields a manual search and its storage path are built from
+_ITEM_SEARCH_COLUMNS = "id, project_id, brand, model_number, product_name"
 
 
 @app.post("/api/items/{item_id}/retry")
 async def retry_item(item_id: str, user: dict = Depends(get_current_user)):
     # Fetch the item to get brand/model/product_name
-    sb = db.get_client()
-    resp = sb.table("project_items").select("*").eq("id", item_id).maybe_single().execute()
-    if resp is None or not resp.data:
+    item = db.get_project_item(item_id, _ITEM_SEARCH_COLUMNS)
+    if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    item = resp.data
 
     logger.info("Retrying item: %s %s", item.get("brand", ""), item["model_number"])
 
-    result = find_manual_and_warranty(
-        item.get("brand", ""),
-        item["model_number"],
-        item.get("product_name", ""),
-    )
+    result = await asyncio.to_thread(_search_manual, item)
 
     storage_path = None
     manual_url = None
@@ -632,13 +913,13 @@ async def batch_delete_items(data: dict, user: dict = Depends(get_current_user))
 @app.get("/api/products")
 async def list_products(search: str | None = None, user: dict = Depends(get_current_user)):
     products = db.list_products(search)
-    # Regenerate fresh signed URLs for products stored in Supabase
+    # Fresh signed URLs for products stored in Supabase, signed in one batch;
+    # products whose path couldn't be signed keep their existing manual_source_url
+    signed = db.get_manual_urls([p["manual_storage_path"] for p in products if p.get("manual_storage_path")])
     for p in products:
-        if p.get("manual_storage_path"):
-            try:
-                p["manual_source_url"] = db.get_manual_url(p["manual_storage_path"])
-            except Exception:
-                pass  # keep existing manual_source_url if signing fails
+        url = signed.get(p.get("manual_storage_path"))
+        if url:
+            p["manual_source_url"] = url
     return products
 
 
@@ -663,18 +944,19 @@ async def delete_product(product_id: str, user: dict = Depends(get_current_user)
 @app.post("/api/products/{product_id}/upload-manual")
 async def upload_product_manual(product_id: str, file: UploadFile = File(...), user: dict = Depends(get_current_user)):
     """Upload a PDF manual for a product in the library."""
-    sb = db.get_client()
-    resp = sb.table("products").select("*").eq("id", product_id).maybe_single().execute()
-    if not resp or not resp.data:
+    product = db.get_product(product_id, "id, brand, model_number")
+    if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    product = resp.data
 
-    pdf_bytes = await file.read()
     safe_brand = (product.get("brand") or "unknown").replace(" ", "_")
     model = product["model_number"]
     storage_path = f"library/{safe_brand}_{model}_manual.pdf"
 
-    db.upload_manual(pdf_bytes, storage_path)
+    pdf_path, _ = await _spool_upload(file)
+    try:
+        db.upload_manual(pdf_path, storage_path)
+    finally:
+        os.unlink(pdf_path)
     manual_url = db.get_manual_url(storage_path)
 
     updated = db.update_product(product_id, {
@@ -688,18 +970,19 @@ async def upload_product_manual(product_id: str, file: UploadFile = File(...), u
 @app.post("/api/items/{item_id}/upload-manual")
 async def upload_item_manual(item_id: str, file: UploadFile = File(...), user: dict = Depends(get_current_user)):
     """Upload a PDF manual for a project item (also updates product cache)."""
-    sb = db.get_client()
-    resp = sb.table("project_items").select("*").eq("id", item_id).maybe_single().execute()
-    if not resp or not resp.data:
+    item = db.get_project_item(item_id, _ITEM_SEARCH_COLUMNS)
+    if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    item = resp.data
 
-    pdf_bytes = await file.read()
     safe_brand = (item.get("brand") or "unknown").replace(" ", "_")
     model = item["model_number"]
     storage_path = f"{item['project_id']}/{safe_brand}_{model}_manual.pdf"
 
-    db.upload_manual(pdf_bytes, storage_path)
+    pdf_path, _ = await _spool_upload(file)
+    try:
+        db.upload_manual(pdf_path, storage_path)
+    finally:
+        os.unlink(pdf_path)
     manual_url = db.get_manual_url(storage_path)
 
     # Update product cache
@@ -719,111 +1002,138 @@ async def upload_item_manual(item_id: str, file: UploadFile = File(...), user: d
     }
     if product.get("id"):
         update_data["product_id"] = product["id"]
-    db.update_project_item(item_id, update_data)
+    updated = db.update_project_item(item_id, update_data)
 
-    # Return with product join
-    final = sb.table("project_items").select("*, products(*)").eq("id", item_id).maybe_single().execute()
-    return final.data if final and final.data else update_data
+    # Same shape as select("*, products(*)"), built from rows we already hold
+    return {**item, **updated, "products": product if product.get("id") else None}
 
 
 # ---------------------------------------------------------------------------
 # Excel export
 # ---------------------------------------------------------------------------
 
-@app.get("/api/projects/{project_id}/export")
-async def export_excel(project_id: str, ids: str | None = None, user: dict = Depends(get_current_user)):
-    await _check_project_access(project_id, user)
-    project = db.get_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+# Export styles are built once and shared by every cell that uses them
+_HEADER_FILL = PatternFill(start_color="1A3A5C", end_color="1A3A5C", fill_type="solid")
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HYPERLINK_FONT = Font(color="0563C1", underline="single")
+_STATUS_FILLS = {
+    status: PatternFill(start_color=color, end_color=color, fill_type="solid")
+    for status, color in {
+        "found": "C6EFCE",
+        "not_found": "FFC7CE",
+        "manual_entry": "FFEB9C",
+        "pending": "D9D9D9",
+    }.items()
+}
 
-    all_items = db.get_project_items(project_id)
-    if ids:
-        selected = set(ids.split(","))
-        items = [i for i in all_items if i["id"] in selected]
-    else:
-        items = all_items
 
-    wb = Workbook()
+# Exports are spooled in memory up to this size, then spill to a temp file
+_EXPORT_SPOOL_MAX = 16 * 1024 * 1024
+_STREAM_CHUNK = 64 * 1024
+
+
+def _stream_spooled(spool):
+    """Yield a spooled file's content in chunks, closing it once fully sent."""
+    with spool:
+        spool.seek(0)
+        yield from iter(lambda: spool.read(_STREAM_CHUNK), b"")
+
+
+def _build_export_workbook(items: list[dict]) -> tempfile.SpooledTemporaryFile:
+    """Write the two-sheet export for *items* into a spooled temp file."""
+    # Write-only mode serializes each row as it is appended instead of keeping
+    # every cell object alive until save
+    wb = Workbook(write_only=True)
 
     # --- Sheet 1: Products & Manuals ---
-    ws1 = wb.active
-    ws1.title = "Products & Manuals"
+    ws1 = wb.create_sheet("Products & Manuals")
 
-    navy_fill = PatternFill(start_color="1A3A5C", end_color="1A3A5C", fill_type="solid")
-    white_bold = Font(bold=True, color="FFFFFF")
+    def header_row(ws, headers: list[str]) -> list[WriteOnlyCell]:
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.fill = _HEADER_FILL
+            cell.font = _HEADER_FONT
+            cells.append(cell)
+        return cells
 
     headers = ["Brand", "Model Number", "Product Name", "Manual Link", "Status", "Notes"]
     widths = [15, 22, 45, 20, 15, 30]
 
-    for col_idx, (header, width) in enumerate(zip(headers, widths), 1):
-        cell = ws1.cell(row=1, column=col_idx, value=header)
-        cell.fill = navy_fill
-        cell.font = white_bold
+    # Column widths must be set before the first row is written
+    for col_idx, width in enumerate(widths, 1):
         ws1.column_dimensions[get_column_letter(col_idx)].width = width
+    ws1.append(header_row(ws1, headers))
 
-    status_colors = {
-        "found": "C6EFCE",
-        "not_found": "FFC7CE",
-        "manual_entry": "FFEB9C",
-        "pending": "D9D9D9",
-    }
-
-    for row_idx, item in enumerate(items, 2):
-        ws1.cell(row=row_idx, column=1, value=item.get("brand"))
-        ws1.cell(row=row_idx, column=2, value=item.get("model_number"))
-        ws1.cell(row=row_idx, column=3, value=item.get("product_name"))
-
+    # Sheet 2's rows, gathered while Sheet 1 is written
+    not_found = []
+    for item in items:
         # Manual link as hyperlink
         manual_url = item.get("manual_url")
         if manual_url:
-            cell = ws1.cell(row=row_idx, column=4, value="Open Manual")
-            cell.hyperlink = manual_url
-            cell.font = Font(color="0563C1", underline="single")
+            link_cell = WriteOnlyCell(ws1, value="Open Manual")
+            link_cell.hyperlink = manual_url
+            link_cell.font = _HYPERLINK_FONT
         else:
-            ws1.cell(row=row_idx, column=4, value="")
+            link_cell = ""
 
         # Status with color
         status = item.get("status", "pending")
-        status_cell = ws1.cell(row=row_idx, column=5, value=status)
-        if status in status_colors:
-            status_cell.fill = PatternFill(
-                start_color=status_colors[status],
-                end_color=status_colors[status],
-                fill_type="solid",
-            )
-
-        ws1.cell(row=row_idx, column=6, value=item.get("notes"))
+        status_cell = WriteOnlyCell(ws1, value=status)
+        if status in _STATUS_FILLS:
+            status_cell.fill = _STATUS_FILLS[status]
+        if status == "not_found":
+            not_found.append(item)
+
+        ws1.append([
+            item.get("brand"),
+            item.get("model_number"),
+            item.get("product_name"),
+            link_cell,
+            status_cell,
+            item.get("notes"),
+        ])
 
     # --- Sheet 2: Needs Manual Lookup ---
     ws2 = wb.create_sheet("Needs Manual Lookup")
-    not_found = [i for i in items if i.get("status") == "not_found"]
 
     headers2 = [
         "Brand", "Model Number", "Product Name",
         "Manual URL (paste here)", "Notes",
     ]
-    for col_idx, header in enumerate(headers2, 1):
-        cell = ws2.cell(row=1, column=col_idx, value=header)
-        cell.fill = navy_fill
-        cell.font = white_bold
-
-    for row_idx, item in enumerate(not_found, 2):
-        ws2.cell(row=row_idx, column=1, value=item.get("brand"))
-        ws2.cell(row=row_idx, column=2, value=item.get("model_number"))
-        ws2.cell(row=row_idx, column=3, value=item.get("product_name"))
+    ws2.append(header_row(ws2, headers2))
+
+    for item in not_found:
         # Columns 4, 5 left blank for user to fill in
+        ws2.append([item.get("brand"), item.get("model_number"), item.get("product_name")])
+
+    spool = tempfile.SpooledTemporaryFile(max_size=_EXPORT_SPOOL_MAX)
+    wb.save(spool)
+    return spool
+
+
+@app.get("/api/projects/{project_id}/export")
+async def export_excel(project_id: str, ids: str | None = None, user: dict = Depends(get_current_user)):
+    await _check_project_access(project_id, user)
+    project = db.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    all_items = db.get_project_items(project_id)
+    if ids:
+        selected = set(ids.split(","))
+        items = [i for i in all_items if i["id"] in selected]
+    else:
+        items = all_items
 
-    # Save to buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    # Building the sheet is CPU-bound — keep it off the event loop
+    spool = await asyncio.to_thread(_build_export_workbook, items)
 
     safe_name = project["name"].replace(" ", "_").replace("/", "_")
     filename = f"{safe_name}_manuals.xlsx"
 
     return StreamingResponse(
-        buffer,
+        _stream_spooled(spool),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
@@ -833,60 +1143,113 @@ async def export_excel(project_id: str, ids: str | None = None, user: dict = Dep
 # Bulk PDF download (ZIP) with progress tracking
 # ---------------------------------------------------------------------------
 
+# Manuals for a ZIP are fetched this many at a time; only the archive writes
+# stay on the building thread, since ZipFile isn't thread-safe.
+_ZIP_FETCH_CONCURRENCY = 8
+# URL-fetched manuals larger than this are left out of the ZIP
+_ZIP_MAX_MANUAL_BYTES = 100 * 1024 * 1024
+
+
+def _fetch_manual_pdf(item: dict, bucket) -> tuple[str, bytes | None]:
+    """Fetch one item's manual for the ZIP: storage copy first, then its URL."""
+    brand = item.get("brand") or "unknown"
+    model = item.get("model_number") or "unknown"
+    arcname = f"{brand.replace(' ', '_')}_{model.replace(' ', '_')}_manual.pdf"
+
+    product = item.get("products")
+    storage_path = product.get("manual_storage_path") if product else None
+    pdf_bytes = None
+
+    if storage_path:
+        try:
+            pdf_bytes = bucket.download(storage_path)
+        except Exception:
+            pass
+
+    if not pdf_bytes and item.get("manual_url"):
+        try:
+            # Streamed so a non-PDF or oversized response is dropped before
+            # (or while) its body is read
+            with HTTP.get(item["manual_url"], timeout=30, stream=True) as resp:
+                content_type = resp.headers.get("Content-Type", "").lower()
+                length = resp.headers.get("Content-Length", "")
+                too_big = length.isdigit() and int(length) > _ZIP_MAX_MANUAL_BYTES
+                if "pdf" in content_type and not too_big:
+                    body = bytearray()
+                    for chunk in resp.iter_content(_STREAM_CHUNK):
+                        body += chunk
+                        if len(body) > _ZIP_MAX_MANUAL_BYTES:
+                            break
+                    else:
+                        pdf_bytes = bytes(body)
+        except Exception:
+            pass
+
+    return arcname, pdf_bytes
+
+
 def _build_download_zip(job_id: str, items: list[dict], project_name: str):
     """Background thread: build a ZIP of manual PDFs with per-item progress."""
     total = len(items)
+    # Written to disk as it's built so memory stays at one PDF, not the whole
+    # archive; download_file removes it once it has been sent
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
     try:
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            for idx, item in enumerate(items, 1):
+        # PDFs are already compressed internally; deflating them again burns
+        # CPU for well under 1% savings, so real PDFs are stored as-is and
+        # anything else gets a cheap level-1 deflate
+        with tmp, zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf, \
+                ThreadPoolExecutor(max_workers=_ZIP_FETCH_CONCURRENCY, thread_name_prefix="zipfetch") as pool:
+            # One bucket handle for the whole build, shared by the fetch threads
+            bucket = db.get_client().storage.from_("manuals")
+            futures = {pool.submit(_fetch_manual_pdf, item, bucket): item for item in items}
+            for done, future in enumerate(as_completed(futures), 1):
+                # Drop each finished future so its PDF can be freed once written
+                item = futures.pop(future)
                 brand = item.get("brand") or "unknown"
                 model = item.get("model_number") or "unknown"
 
                 _download_jobs[job_id] = {
                     "status": "building",
-                    "message": f"Downloading {idx}/{total}: {brand} {model}",
-                    "current": idx,
+                    "message": f"Downloaded {done}/{total}: {brand} {model}",
+                    "current": done,
                     "total": total,
                 }
 
-                product = item.get("products")
-                storage_path = product.get("manual_storage_path") if product else None
-                pdf_bytes = None
-
-                if storage_path:
-                    try:
-                        sb = db.get_client()
-                        pdf_bytes = sb.storage.from_("manuals").download(storage_path)
-                    except Exception:
-                        pass
-
-                if not pdf_bytes and item.get("manual_url"):
-                    try:
-                        resp = requests_lib.get(item["manual_url"], timeout=30)
-                        if "pdf" in resp.headers.get("Content-Type", "").lower():
-                            pdf_bytes = resp.content
-                    except Exception:
-                        pass
-
+                arcname, pdf_bytes = future.result()
                 if pdf_bytes:
-                    safe_brand = brand.replace(" ", "_")
-                    safe_model = model.replace(" ", "_")
-                    zf.writestr(f"{safe_brand}_{safe_model}_manual.pdf", pdf_bytes)
+                    if pdf_bytes.startswith(b"%PDF"):
+                        zf.writestr(arcname, pdf_bytes)
+                    else:
+                        zf.writestr(arcname, pdf_bytes, zipfile.ZIP_DEFLATED, compresslevel=1)
 
-        buffer.seek(0)
         safe_name = project_name.replace(" ", "_").replace("/", "_")
+        filename = f"{safe_name}_manuals.zip"
+        shared = {}
+        if get_redis() is not None:
+            # Job state is shared through Redis but disks aren't, so the ZIP goes
+            # to storage where any worker can serve the file request
+            try:
+                db.remove_stale_download_zips(_download_jobs.ttl)
+            except Exception as e:
+                logger.warning("Could not sweep old download ZIPs: %s", e)
+            shared = {"storage_path": db.upload_download_zip(tmp.name, job_id), "filename": filename}
+            _discard_temp_file(tmp.name)
+        else:
+            with _download_files_lock:
+                _download_files[job_id] = {"file_path": tmp.name, "filename": filename}
 
         _download_jobs[job_id] = {
             "status": "done",
             "message": "Download ready!",
             "current": total,
             "total": total,
-            "file_bytes": buffer.getvalue(),
-            "filename": f"{safe_name}_manuals.zip",
+            **shared,
         }
     except Exception as e:
         logger.error("Download ZIP build failed: %s", e, exc_info=True)
+        tmp.close()
+        _discard_temp_file(tmp.name)
         _download_jobs[job_id] = {
             "status": "error",
             "message": str(e),
@@ -912,7 +1275,11 @@ async def start_download(project_id: str, data: dict = Body(default={}), user: d
     else:
         items = all_items
 
-    items_with_manual = [i for i in items if i.get("manual_url")]
+    # Only items the builder can actually fetch: a stored copy or a URL
+    items_with_manual = [
+        i for i in items
+        if (i.get("products") or {}).get("manual_storage_path") or i.get("manual_url")
+    ]
     if not items_with_manual:
         raise HTTPException(status_code=404, detail="No manuals available to download")
 
@@ -934,13 +1301,50 @@ async def start_download(project_id: str, data: dict = Body(default={}), user: d
     return {"download_id": job_id, "total": len(items_with_manual)}
 
 
+_PRIVATE_JOB_FIELDS = ("storage_path", "filename")
+
+
 @app.get("/api/downloads/{job_id}/progress")
 async def download_progress(job_id: str):
     """Poll download job progress."""
     job = _download_jobs.get(job_id)
     if not job:
-        return {"status": "not_found", "message": "Download job not found"}
-    return {k: v for k, v in job.items() if k not in ("file_bytes", "filename")}
+        return ORJSONResponse({"status": "not_found", "message": "Download job not found"})
+    # This route is unauthenticated; where the finished ZIP is stored stays private
+    return ORJSONResponse({k: v for k, v in job.items() if k not in _PRIVATE_JOB_FIELDS})
+
+
+def _open_shared_zip(storage_path: str):
+    resp = HTTP.get(db.get_download_zip_url(storage_path), stream=True, timeout=30)
+    if resp.status_code != 200:
+        resp.close()
+        raise HTTPException(status_code=404, detail="Download not ready")
+    return resp
+
+
+def _relay_shared_zip(resp, storage_path: str):
+    """Pass a parked ZIP through to the client, then delete it from storage."""
+    try:
+        with resp:
+            yield from resp.iter_content(_STREAM_CHUNK)
+    finally:
+        try:
+            db.delete_download_zip(storage_path)
+        except Exception as e:
+            logger.warning("Could not delete download ZIP %s: %s", storage_path, e)
+
+
+async def _serve_shared_zip(job_id: str, job: dict):
+    """Serve a ZIP parked in storage, relayed so the response stays same-origin."""
+    storage_path = job["storage_path"]
+    resp = await asyncio.to_thread(_open_shared_zip, storage_path)
+    _download_jobs.pop(job_id, None)
+    filename = job.get("filename", "manuals.zip")
+    return StreamingResponse(
+        _relay_shared_zip(resp, storage_path),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @app.get("/api/downloads/{job_id}/file")
@@ -950,16 +1354,23 @@ async def download_file(job_id: str):
     if not job or job.get("status") != "done":
         raise HTTPException(status_code=404, detail="Download not ready")
 
-    file_bytes = job.get("file_bytes")
-    filename = job.get("filename", "manuals.zip")
+    if job.get("storage_path"):
+        return await _serve_shared_zip(job_id, job)
 
     # Clean up
-    del _download_jobs[job_id]
+    with _download_files_lock:
+        download = _download_files.pop(job_id, None)
+    if download is None:
+        raise HTTPException(status_code=404, detail="Download not ready")
+    _download_jobs.pop(job_id, None)
+    file_path = download["file_path"]
+    filename = download.get("filename", "manuals.zip")
 
-    return StreamingResponse(
-        io.BytesIO(file_bytes),
+    return FileResponse(
+        file_path,
         media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        filename=filename,
+        background=BackgroundTask(os.unlink, file_path),
     )
 
 
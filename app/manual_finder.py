@@ -3,22 +3,25 @@ from __future__ import annotations
 import logging
 import os
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs, unquote, urljoin
 
-import requests
 from bs4 import BeautifulSoup
+from cachetools import TTLCache
 from openai import OpenAI
 
-logger = logging.getLogger("ati.search")
+from .http_client import HTTP
+from .state import JobStore
 
-_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+try:
+    # C-backed HTML parser, many times faster than html.parser on big pages
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+logger = logging.getLogger("ati.search")
 
 _MANUFACTURER_DOMAINS = {
     "crestron": "crestron.com",
@@ -66,6 +69,26 @@ _MANUFACTURER_DOMAINS = {
     "ruckus": "ruckuswireless.com",
 }
 
+# Brand keys with everything but letters and digits removed, so contract
+# spellings like "Snap-One", "Middle_Atlantic" or "CONTROL 4" still match
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+_DOMAIN_LOOKUP = {_NON_ALNUM_RE.sub("", k): v for k, v in _MANUFACTURER_DOMAINS.items()}
+
+
+def _domain_for(brand: str) -> str | None:
+    """The manufacturer's domain for a brand as written on a contract, if known."""
+    return _DOMAIN_LOOKUP.get(_NON_ALNUM_RE.sub("", brand.lower()))
+
+
+# The line Perplexity is asked to put its answer on
+_PDF_URL_RE = re.compile(r"PDF_URL:\s*(https?://\S+)")
+# Words that mark a citation URL, or a link on a scanned page, as documentation.
+# Each set is one alternation so a string is checked in a single regex scan.
+_CITATION_KEYWORDS = ("manual", "guide", "instruction", "documentation", "user-guide")
+_LINK_KEYWORDS = ("manual", "guide", "user guide", "instruction", "documentation")
+_CITATION_KW_RE = re.compile("|".join(map(re.escape, _CITATION_KEYWORDS)))
+_LINK_KW_RE = re.compile("|".join(map(re.escape, _LINK_KEYWORDS)))
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
@@ -87,89 +110,327 @@ def _clean_ddg_url(href: str) -> str | None:
     return None
 
 
+# Search results and scanned page links are reused for a day: a contract full
+# of one brand's products repeats the same site: queries and landing pages, and
+# so do later contracts for the same brands. With REDIS_URL set they're shared
+# by every worker and survive restarts. Failed lookups aren't cached, so
+# they're retried next time.
+_LOOKUP_CACHE_TTL = 24 * 3600
+_ddg_cache = JobStore("ddg", ttl=_LOOKUP_CACHE_TTL)
+_scan_cache = JobStore("pdfscan", ttl=_LOOKUP_CACHE_TTL)
+
+# DuckDuckGo rate-limits bursts, so at most this many searches are in flight
+# across the whole process
+_DDG_CONCURRENCY = 4
+_ddg_slots = threading.BoundedSemaphore(_DDG_CONCURRENCY)
+
+
+class _HostLimiter:
+    """Token bucket per host: *burst* requests at once, then *rate* per second.
+
+    wait() reserves the caller's turn under the lock and sleeps outside it, so
+    concurrent callers queue up in arrival order without holding each other.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}  # host -> (tokens, stamp)
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            tokens, stamp = self._buckets.get(host, (self._burst, now))
+            # Negative tokens are turns already promised to earlier callers
+            tokens = min(self._burst, tokens + (now - stamp) * self._rate) - 1
+            self._buckets[host] = (tokens, now)
+        if tokens < 0:
+            time.sleep(-tokens / self._rate)
+
+
+# A throttled DuckDuckGo answer parses as "no results", so searches are also
+# paced to about one a second, the rate the finder used to keep with sleeps
+_DDG_URL = "https://html.duckduckgo.com/html/"
+_ddg_limiter = _HostLimiter(rate=1.0, burst=3)
+
+
+def _hrefs(html: str, *selectors: str) -> list[str]:
+    """The href of every element matching each CSS selector, selector by selector."""
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        return [node.attributes.get("href") or "" for sel in selectors for node in tree.css(sel)]
+    soup = BeautifulSoup(html, "html.parser")
+    return [tag.get("href", "") for sel in selectors for tag in soup.select(sel)]
+
+
+def _pdf_links(html: str) -> list[tuple[str, str]]:
+    """(href, lower-cased link text) for every link on a page whose href ends in .pdf."""
+    links = []
+    if HTMLParser is not None:
+        for node in HTMLParser(html).css("a[href]"):
+            href = node.attributes.get("href") or ""
+            # Only PDF links can qualify, so skip the text extraction for the rest
+            if href.lower().endswith(".pdf"):
+                links.append((href, node.text(strip=True).lower()))
+    else:
+        for tag in BeautifulSoup(html, "html.parser").find_all("a", href=True):
+            href = tag["href"]
+            if href.lower().endswith(".pdf"):
+                links.append((href, tag.get_text(strip=True).lower()))
+    return links
+
+
 def _search_duckduckgo(query: str) -> list[str]:
     """Search DuckDuckGo HTML and return up to 10 result URLs."""
+    cached = _ddg_cache.get(query)
+    if cached is not None:
+        return list(cached["urls"])
+
     try:
-        resp = requests.get(
-            "https://html.duckduckgo.com/html/",
-            params={"q": query},
-            headers=_HEADERS,
-            timeout=15,
-        )
+        _ddg_limiter.wait(_DDG_URL)
+        with _ddg_slots:
+            resp = HTTP.get(
+                _DDG_URL,
+                params={"q": query},
+                timeout=15,
+            )
         resp.raise_for_status()
     except Exception as e:
         logger.warning("DuckDuckGo search failed for '%s': %s", query, e)
         return []
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    urls: list[str] = []
+    # result__url links first, then result__a, selector by selector so both
+    # parser backends agree; dedupe while preserving order, skip DuckDuckGo URLs
+    cleaned = (_clean_ddg_url(href) for href in _hrefs(resp.text, "a.result__url", "a.result__a"))
+    unique = list(dict.fromkeys(u for u in cleaned if u and "duckduckgo.com" not in u))
 
-    for tag in soup.select("a.result__url"):
-        url = _clean_ddg_url(tag.get("href", ""))
-        if url:
-            urls.append(url)
+    logger.info("  DDG search '%s' → %d results", query[:60], len(unique))
+    # No results usually means a throttled or changed page, not a real answer
+    if unique:
+        _ddg_cache[query] = {"urls": unique[:10]}
+    return unique[:10]
 
-    for tag in soup.select("a.result__a"):
-        url = _clean_ddg_url(tag.get("href", ""))
-        if url:
-            urls.append(url)
 
-    # Deduplicate while preserving order, skip DuckDuckGo URLs
-    seen: set[str] = set()
-    unique: list[str] = []
-    for u in urls:
-        if u not in seen and "duckduckgo.com" not in u:
-            seen.add(u)
-            unique.append(u)
+def _search_duckduckgo_all(queries: list[str]) -> list[list[str]]:
+    """Run several DuckDuckGo searches at once; results come back in query order."""
+    with ThreadPoolExecutor(max_workers=len(queries) or 1, thread_name_prefix="ddg") as pool:
+        return list(pool.map(_search_duckduckgo, queries))
+
+
+# HTML is only read up to these sizes: the text (and, nearly always, the links)
+# worth having come well before the tail of a multi-megabyte support page
+_PAGE_TEXT_BYTES = 256 * 1024
+_SCAN_PAGE_BYTES = 2 * 1024 * 1024
+_HTML_CHUNK = 64 * 1024
 
-    logger.info("  DDG search '%s' → %d results", query[:60], len(unique))
-    return unique[:10]
+
+def _read_html(resp, limit: int) -> str:
+    """Decode at most *limit* bytes of a streamed response body."""
+    body = bytearray()
+    for chunk in resp.iter_content(_HTML_CHUNK):
+        body += chunk
+        if len(body) >= limit:
+            break
+    return bytes(body[:limit]).decode(resp.encoding or "utf-8", errors="replace")
 
 
 def _fetch_page_text(url: str) -> str:
     """Fetch a page and return up to 8000 chars of cleaned text."""
     try:
-        resp = requests.get(url, headers=_HEADERS, timeout=15)
-        resp.raise_for_status()
+        # Range lets servers that honour it stop early; the read cap covers the rest
+        with HTTP.get(
+            url, timeout=15, stream=True, headers={"Range": f"bytes=0-{_PAGE_TEXT_BYTES - 1}"},
+        ) as resp:
+            resp.raise_for_status()
+            html = _read_html(resp, _PAGE_TEXT_BYTES)
     except Exception as e:
         logger.debug("  Failed to fetch %s: %s", url[:80], e)
         return ""
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    for tag in soup(["script", "style", "nav", "footer", "header"]):
-        tag.decompose()
-    text = soup.get_text(separator=" ", strip=True)
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for node in tree.css("script, style, nav, footer, header"):
+            node.decompose()
+        root = tree.body or tree.root
+        text = root.text(separator=" ", strip=True) if root is not None else ""
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+        for tag in soup(["script", "style", "nav", "footer", "header"]):
+            tag.decompose()
+        text = soup.get_text(separator=" ", strip=True)
     return text[:8000]
 
 
+# Candidate PDFs are downloaded several at a time, but never more than
+# _PER_HOST_LIMIT at once from any one server.
+_DOWNLOAD_CONCURRENCY = 8
+_PER_HOST_LIMIT = 2
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+
+# Prefer a PDF, but still accept whatever the server has so mislabeled PDFs
+# can be caught by their magic bytes
+_PDF_ACCEPT = {"Accept": "application/pdf, */*;q=0.5"}
+_PDF_CHUNK = 64 * 1024
+# Anything bigger isn't a manual worth storing; the read stops once past it
+_MAX_PDF_BYTES = 100 * 1024 * 1024
+# (connect, read): an unreachable host gives up fast and frees its host slot,
+# while a slow but live server still gets the full read window between chunks
+_PDF_TIMEOUT = (5, 30)
+
+# Recently downloaded PDFs by URL, bounded by total size. One manual often
+# covers a whole model series, so several rows of a contract resolve to it.
+# Kept no longer than the search caches, so a manual replaced at the same URL
+# is picked up again.
+_pdf_cache: TTLCache = TTLCache(maxsize=64 * 1024 * 1024, ttl=_LOOKUP_CACHE_TTL, getsizeof=len)
+_pdf_cache_lock = threading.Lock()
+_host_slots_lock = threading.Lock()
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(_PER_HOST_LIMIT)
+    return slot
+
+
+def _is_html_page(url: str) -> bool:
+    """True when a HEAD request says *url* is an ordinary HTML page."""
+    try:
+        head = HTTP.head(url, allow_redirects=True, timeout=(5, 10))
+    except Exception:
+        return False  # Not conclusive; let the GET decide
+    return head.ok and "text/html" in head.headers.get("Content-Type", "").lower()
+
+
+def _read_capped(head: bytes, chunks) -> bytes | None:
+    """Join a streamed body, or None once it grows past _MAX_PDF_BYTES."""
+    body = bytearray(head)
+    for chunk in chunks:
+        body += chunk
+        if len(body) > _MAX_PDF_BYTES:
+            logger.info("  Skipping PDF over %d bytes", _MAX_PDF_BYTES)
+            return None
+    return bytes(body)
+
+
 def _try_download_pdf(url: str) -> bytes | None:
     """Try to download a PDF from a URL. Returns bytes if successful."""
-    try:
-        resp = requests.get(url, headers=_HEADERS, timeout=30, stream=True)
-        content_type = resp.headers.get("Content-Type", "")
-        if "pdf" in content_type.lower():
-            logger.info("  Downloaded PDF (%d bytes) from %s", len(resp.content), url[:80])
-            return resp.content
-        # Also check for PDF magic bytes as fallback
-        content = resp.content
-        if content[:5] == b"%PDF-":
-            logger.info("  Downloaded PDF via magic bytes (%d bytes) from %s", len(content), url[:80])
-            return content
-    except Exception as e:
-        logger.debug("  PDF download failed for %s: %s", url[:80], e)
+    with _pdf_cache_lock:
+        cached = _pdf_cache.get(url)
+    if cached is not None:
+        logger.info("  Reusing downloaded PDF (%d bytes) from %s", len(cached), url[:80])
+        return cached
+
+    content = _fetch_pdf(url)
+    # The cache raises for a value bigger than the whole cache, so those are just not kept
+    if content is not None and len(content) <= _pdf_cache.maxsize:
+        with _pdf_cache_lock:
+            _pdf_cache[url] = content
+    return content
+
+
+def _fetch_pdf(url: str) -> bytes | None:
+    with _host_slot(url):
+        # Links that don't look like PDFs (mostly Perplexity citations) are
+        # usually product pages; a HEAD rules those out without a body. Only a
+        # clear text/html answer skips the GET, since servers often label real
+        # PDFs octet-stream or refuse HEAD outright.
+        if not urlparse(url).path.lower().endswith(".pdf") and _is_html_page(url):
+            logger.debug("  Skipping HTML page %s", url[:80])
+            return None
+        try:
+            with HTTP.get(url, timeout=_PDF_TIMEOUT, stream=True, headers=_PDF_ACCEPT) as resp:
+                content_type = resp.headers.get("Content-Type", "")
+                length = resp.headers.get("Content-Length", "")
+                if length.isdigit() and int(length) > _MAX_PDF_BYTES:
+                    logger.info("  Skipping PDF over %d bytes at %s", _MAX_PDF_BYTES, url[:80])
+                    return None
+                # Decide from the first chunk; a non-PDF body is never read past it
+                chunks = resp.iter_content(_PDF_CHUNK)
+                head = next(chunks, b"")
+                if "pdf" in content_type.lower():
+                    content = _read_capped(head, chunks)
+                    if content is not None:
+                        logger.info("  Downloaded PDF (%d bytes) from %s", len(content), url[:80])
+                    return content
+                # Also check for PDF magic bytes as fallback
+                if head[:5] == b"%PDF-":
+                    content = _read_capped(head, chunks)
+                    if content is not None:
+                        logger.info("  Downloaded PDF via magic bytes (%d bytes) from %s", len(content), url[:80])
+                    return content
+        except Exception as e:
+            logger.debug("  PDF download failed for %s: %s", url[:80], e)
     return None
 
 
+def _first_pdf(urls: list[str]) -> tuple[str | None, bytes | None]:
+    """Return the first candidate, in the given order, that is a PDF, as (url, bytes).
+
+    Candidates are downloaded concurrently, but the ranking holds: a later URL
+    only wins once every earlier one has turned out not to be a PDF.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return None, None
+    pool = ThreadPoolExecutor(max_workers=min(_DOWNLOAD_CONCURRENCY, len(urls)), thread_name_prefix="pdfdl")
+    try:
+        futures = [(url, pool.submit(_try_download_pdf, url)) for url in urls]
+        for url, future in futures:
+            pdf_bytes = future.result()
+            if pdf_bytes:
+                return url, pdf_bytes
+    finally:
+        # Don't wait on the rest: queued downloads are dropped, running ones
+        # finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+    return None, None
+
+
 # ---------------------------------------------------------------------------
 # Perplexity API (primary search when configured)
 # ---------------------------------------------------------------------------
 
+def _citation_tier(url: str) -> int:
+    low = url.lower()
+    if low.endswith(".pdf"):
+        return 0
+    if _CITATION_KW_RE.search(low):
+        return 1
+    return 2
+
+
+_perplexity_client: OpenAI | None = None
+_perplexity_client_lock = threading.Lock()
+
+
 def _get_perplexity_client() -> OpenAI | None:
-    """Return a Perplexity client if API key is configured, else None."""
+    """Return a Perplexity client if API key is configured, else None.
+
+    Built once per process, so every search shares its connection pool.
+    """
+    global _perplexity_client
     api_key = os.environ.get("PERPLEXITY_API_KEY", "").strip()
     if not api_key:
         return None
-    return OpenAI(api_key=api_key, base_url="https://api.perplexity.ai")
+    if _perplexity_client is None:
+        with _perplexity_client_lock:
+            if _perplexity_client is None:
+                _perplexity_client = OpenAI(api_key=api_key, base_url="https://api.perplexity.ai")
+    return _perplexity_client
+
+
+def _reset_perplexity_client_after_fork():
+    global _perplexity_client, _perplexity_client_lock
+    _perplexity_client = None
+    _perplexity_client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_perplexity_client_after_fork)
 
 
 def _search_perplexity_for_manual(
@@ -185,8 +446,7 @@ def _search_perplexity_for_manual(
     if client is None:
         return {"manual_url": None, "manual_pdf_bytes": None}
 
-    brand_lower = brand.strip().lower()
-    domain = _MANUFACTURER_DOMAINS.get(brand_lower)
+    domain = _domain_for(brand)
     domain_hint = f", preferably from {domain}" if domain else ""
 
     prompt = (
@@ -215,47 +475,33 @@ def _search_perplexity_for_manual(
         candidates: list[str] = []
 
         # Source 1: Explicitly stated PDF_URL in response text
-        pdf_url_match = re.search(r"PDF_URL:\s*(https?://\S+)", text)
+        pdf_url_match = _PDF_URL_RE.search(text)
         if pdf_url_match:
             url = pdf_url_match.group(1).rstrip(")")
             if url != "NOT_FOUND":
                 candidates.append(url)
 
-        # Source 2: Citations ending in .pdf
-        for c in citations:
-            if c.lower().endswith(".pdf"):
-                candidates.append(c)
-
-        # Source 3: Citations containing manual/guide keywords in path
-        manual_kw = ["manual", "guide", "instruction", "documentation", "user-guide"]
-        for c in citations:
-            if any(kw in c.lower() for kw in manual_kw) and c not in candidates:
-                candidates.append(c)
-
-        # Source 4: All remaining citations (lower priority)
-        for c in citations:
-            if c not in candidates:
-                candidates.append(c)
+        # Sources 2-4: citations ending in .pdf, then ones with manual/guide
+        # keywords in the path, then the rest (sorted() keeps Perplexity's order
+        # within each tier); dict.fromkeys drops repeats, keeping first position
+        candidates.extend(sorted(citations, key=_citation_tier))
+        candidates = list(dict.fromkeys(candidates))
 
         # Try downloading PDFs from candidates
         for url in candidates:
             logger.info("  Perplexity candidate: %s", url[:100])
-            pdf_bytes = _try_download_pdf(url)
-            if pdf_bytes:
-                return {"manual_url": url, "manual_pdf_bytes": pdf_bytes}
-            time.sleep(0.5)
+        pdf_url, pdf_bytes = _first_pdf(candidates)
+        if pdf_bytes:
+            return {"manual_url": pdf_url, "manual_pdf_bytes": pdf_bytes}
 
         # If we found URLs but couldn't download PDFs, scan pages for embedded PDF links
-        for url in candidates[:3]:
-            if url.lower().endswith(".pdf"):
-                continue  # Already tried direct download
-            page_pdfs = _scan_page_for_pdf_links(url, model)
-            for pdf_url in page_pdfs:
-                logger.info("  Perplexity page-scan candidate: %s", pdf_url[:100])
-                pdf_bytes = _try_download_pdf(pdf_url)
-                if pdf_bytes:
-                    return {"manual_url": pdf_url, "manual_pdf_bytes": pdf_bytes}
-            time.sleep(0.5)
+        pages = [url for url in candidates[:3] if not url.lower().endswith(".pdf")]  # .pdf already tried
+        page_pdfs = _scan_pages_for_pdf_links(pages, model)
+        for pdf_url in page_pdfs:
+            logger.info("  Perplexity page-scan candidate: %s", pdf_url[:100])
+        pdf_url, pdf_bytes = _first_pdf(page_pdfs)
+        if pdf_bytes:
+            return {"manual_url": pdf_url, "manual_pdf_bytes": pdf_bytes}
 
         # Return the best URL even if we couldn't download it
         if candidates:
@@ -282,8 +528,7 @@ def _build_search_queries(brand: str, model: str, product_name: str) -> list[str
     queries.append(f"{brand} {model} user manual PDF")
 
     # Query 2: manufacturer-specific or fallback
-    brand_lower = brand.strip().lower()
-    domain = _MANUFACTURER_DOMAINS.get(brand_lower)
+    domain = _domain_for(brand)
     if domain:
         queries.append(f"site:{domain} {model} manual")
     else:
@@ -297,30 +542,45 @@ def _build_search_queries(brand: str, model: str, product_name: str) -> list[str
 
 def _scan_page_for_pdf_links(page_url: str, model: str) -> list[str]:
     """Scrape a page for links that look like manual PDFs. Returns candidate URLs."""
+    key = f"{model.lower()} {page_url}"
+    cached = _scan_cache.get(key)
+    if cached is not None:
+        return list(cached["urls"])
+
     candidates: list[str] = []
     try:
-        resp = requests.get(page_url, headers=_HEADERS, timeout=15)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        model_lower = model.lower()
-        manual_keywords = ["manual", "guide", "user guide", "instruction", "documentation"]
-
-        for a_tag in soup.find_all("a", href=True):
-            href = a_tag["href"]
-            link_text = a_tag.get_text(strip=True).lower()
-            lower_href = href.lower()
-
-            is_pdf_link = lower_href.endswith(".pdf")
-            has_manual_kw = any(kw in lower_href or kw in link_text for kw in manual_keywords)
-            has_model = model_lower in lower_href or model_lower in link_text
-
-            if is_pdf_link and (has_manual_kw or has_model):
-                abs_url = urljoin(page_url, href) if not href.startswith("http") else href
-                candidates.append(abs_url)
+        with HTTP.get(page_url, timeout=15, stream=True) as resp:
+            # A blocked or throttled page says nothing about its links; raise
+            # so it isn't cached as having none
+            resp.raise_for_status()
+            html = _read_html(resp, _SCAN_PAGE_BYTES)
+        # A manual keyword or the model number, in the href or the link text
+        # (an empty model matches every PDF link)
+        wanted = re.compile(f"{_LINK_KW_RE.pattern}|{re.escape(model.lower())}")
+
+        for href, link_text in _pdf_links(html):
+            if wanted.search(href.lower()) or wanted.search(link_text):
+                candidates.append(urljoin(page_url, href))
+        _scan_cache[key] = {"urls": candidates}
     except Exception:
         pass
     return candidates
 
 
+def _on_domain(url: str, domain: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    return host == domain or host.endswith("." + domain)
+
+
+def _scan_pages_for_pdf_links(page_urls: list[str], model: str) -> list[str]:
+    """Scan several pages at once; candidates come back in page order."""
+    if not page_urls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(page_urls), thread_name_prefix="pagescan") as pool:
+        per_page = pool.map(lambda url: _scan_page_for_pdf_links(url, model), page_urls)
+        return [candidate for candidates in per_page for candidate in candidates]
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -356,43 +616,37 @@ def find_manual_and_warranty(
     if not manual_pdf_bytes:
         logger.info("  Using DuckDuckGo for manual search...")
         queries = _build_search_queries(brand, model, product_name)
+        domain = _domain_for(brand)
+        # The queries don't depend on each other, so they're searched all at once
+        all_results = _search_duckduckgo_all(queries)
+
+        # Pass 1: direct PDF URLs from every query's results, best query first.
+        # Cheap compared with page scans, so they all go before any scan.
+        direct = list(dict.fromkeys(
+            url for search_urls in all_results for url in search_urls if url.lower().endswith(".pdf")
+        ))
+        for url in direct:
+            logger.info("  Trying direct PDF: %s", url[:80])
+        pdf_url, pdf_bytes = _first_pdf(direct)
+        if pdf_bytes:
+            manual_pdf_bytes = pdf_bytes
+            manual_source_url = pdf_url
 
-        for query_idx, query in enumerate(queries):
-            if manual_pdf_bytes:
-                break
-
-            logger.info("  DDG Query %d/%d: '%s'", query_idx + 1, len(queries), query)
-            search_urls = _search_duckduckgo(query)
-            time.sleep(1)
-
-            # Pass 1: Check for direct PDF URLs in results
-            for url in search_urls:
-                if url.lower().endswith(".pdf"):
-                    logger.info("  Trying direct PDF: %s", url[:80])
-                    pdf_bytes = _try_download_pdf(url)
-                    if pdf_bytes:
-                        manual_pdf_bytes = pdf_bytes
-                        manual_source_url = url
-                        break
-                    time.sleep(1)
-
+        # Pass 2: Scrape result pages for embedded PDF links, query by query —
+        # only the manufacturer's own pages when any turned up, since review
+        # sites and aggregators rarely link the manual
+        for search_urls in all_results:
             if manual_pdf_bytes:
                 break
-
-            # Pass 2: Scrape result pages for embedded PDF links
             logger.info("  No direct PDF, scanning result pages...")
-            for url in search_urls[:4]:
-                pdf_candidates = _scan_page_for_pdf_links(url, model)
-                for candidate in pdf_candidates:
-                    logger.info("  Trying candidate PDF: %s", candidate[:80])
-                    pdf_bytes = _try_download_pdf(candidate)
-                    if pdf_bytes:
-                        manual_pdf_bytes = pdf_bytes
-                        manual_source_url = candidate
-                        break
-                if manual_pdf_bytes:
-                    break
-                time.sleep(1)
+            pages = [u for u in search_urls if domain and _on_domain(u, domain)] or search_urls
+            pdf_candidates = _scan_pages_for_pdf_links(pages[:4], model)
+            for candidate in pdf_candidates:
+                logger.info("  Trying candidate PDF: %s", candidate[:80])
+            pdf_url, pdf_bytes = _first_pdf(pdf_candidates)
+            if pdf_bytes:
+                manual_pdf_bytes = pdf_bytes
+                manual_source_url = pdf_url
 
     status = "found" if manual_pdf_bytes else "not_found"
     logger.info("  Result: %s (manual=%s)", status, "yes" if manual_pdf_bytes else "no")
@@ -423,9 +677,9 @@ def download_pdf_from_url(url: str) -> bytes | None:
     page_pdfs = _scan_page_for_pdf_links(url, "")
     for candidate in page_pdfs:
         logger.info("  Trying page PDF link: %s", candidate[:100])
-        pdf_bytes = _try_download_pdf(candidate)
-        if pdf_bytes:
-            return pdf_bytes
+    _, pdf_bytes = _first_pdf(page_pdfs)
+    if pdf_bytes:
+        return pdf_bytes
 
     logger.info("  Could not download PDF from %s", url[:100])
     return None
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
 import io
-import json
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
 import pdfplumber
 from anthropic import Anthropic
 
+try:
+    # PDFium (C++) extracts text many times faster than pdfplumber's
+    # pure-Python layout pass
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+from .llm_cache import cached_message
+
 _SYSTEM_PROMPT = """You are a specialist in AV (audio-visual) and smart home systems for a company called ATI of America.
 You are given the raw text of a project contract and must extract a structured list of the main installed
 products that would have user manuals and manufacturer warranties.
@@ -38,58 +50,144 @@ Return ONLY a JSON array (no markdown fences, no extra text):
 ]"""
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extract text from all pages of a PDF."""
-    pages: list[str] = []
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                pages.append(text)
-    return "\n".join(pages)
+# Optional ``` / ```json fence around the reply's JSON array
+_FENCE_RE = re.compile(r"^(?:```[\w-]*)?\s*(.*?)\s*(?:```)?$", re.S)
 
 
-def parse_products_from_text(contract_text: str) -> list[dict]:
-    """Send contract text to Claude Opus and return a deduplicated product list."""
-    client = Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+def _open(pdf: bytes | str | os.PathLike):
+    return pdfplumber.open(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+
+
+def count_pdf_pages(pdf: bytes | str | os.PathLike) -> int:
+    if pdfium is not None:
+        doc = pdfium.PdfDocument(pdf)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+    with _open(pdf) as doc:
+        return len(doc.pages)
+
+
+def _page_texts(pdf: bytes | str | os.PathLike, start: int, stop: int | None) -> list[str]:
+    """Text of pages[start:stop], from PDFium where possible.
+
+    Pages PDFium returns nothing for are retried with pdfplumber, which copes
+    better with some unusual font encodings.
+    """
+    if pdfium is None:
+        with _open(pdf) as doc:
+            return [page.extract_text() or "" for page in doc.pages[start:stop]]
+
+    texts: list[str] = []
+    doc = pdfium.PdfDocument(pdf)
+    try:
+        indices = range(len(doc))[start:stop]
+        for i in indices:
+            page = doc[i]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+    finally:
+        doc.close()
+
+    empty = [n for n, text in enumerate(texts) if not text.strip()]
+    if empty:
+        with _open(pdf) as plumber_doc:
+            for n in empty:
+                texts[n] = plumber_doc.pages[indices[n]].extract_text() or ""
+    return texts
+
+
+def extract_text_from_pdf(pdf: bytes | str | os.PathLike, start: int = 0, stop: int | None = None) -> str:
+    """Extract text from a PDF's pages (all, or pages[start:stop]), given its bytes or a path to it."""
+    return "\n".join(text for text in _page_texts(pdf, start, stop) if text)
+
 
-    response = client.messages.create(
+# Contracts longer than this go to Claude in overlapping windows, parsed side
+# by side; each window is cut at a line break so no product row is split
+_MAX_SINGLE_CHARS = 120_000
+_CHUNK_CHARS = 60_000
+_CHUNK_OVERLAP = 5_000
+_CHUNK_CONCURRENCY = 4
+
+
+def _split_contract_text(text: str) -> list[str]:
+    if len(text) <= _MAX_SINGLE_CHARS:
+        return [text]
+    chunks: list[str] = []
+    start = 0
+    while len(text) - start > _CHUNK_CHARS:
+        cut = text.rfind("\n", start + _CHUNK_CHARS // 2, start + _CHUNK_CHARS)
+        if cut == -1:
+            cut = start + _CHUNK_CHARS
+        chunks.append(text[start:cut])
+        # Back up by the overlap, to the start of a line
+        line = text.find("\n", cut - _CHUNK_OVERLAP, cut)
+        start = line + 1 if line != -1 else cut - _CHUNK_OVERLAP
+    chunks.append(text[start:])
+    return chunks
+
+
+# One client per process so every parse reuses its connection pool
+_client: Anthropic | None = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> Anthropic:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    return _client
+
+
+def _reset_client_after_fork():
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_after_fork)
+
+
+def _parse_chunk(contract_text: str) -> list[dict]:
+    # The same contract text (re-exported PDF, retried upload) reuses the
+    # earlier reply instead of another Opus call
+    text = cached_message(
+        _get_client(),
         model="claude-opus-4-5-20251101",
         max_tokens=4096,
         system=_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": contract_text}],
-    )
-
-    text = response.content[0].text.strip()
+        user=contract_text,
+    ).strip()
 
     # Strip markdown fences if present
-    if text.startswith("```"):
-        # Remove opening fence (with optional language tag)
-        first_newline = text.find("\n")
-        if first_newline != -1:
-            text = text[first_newline + 1:]
-        else:
-            text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    text = text.strip()
-
-    products = json.loads(text)
-
-    # Deduplicate by model_number (case-insensitive), keep first occurrence
-    seen: set[str] = set()
-    unique: list[dict] = []
+    return orjson.loads(_FENCE_RE.match(text).group(1))
+
+
+def parse_products_from_text(contract_text: str) -> list[dict]:
+    """Send contract text to Claude Opus and return a deduplicated product list."""
+    chunks = _split_contract_text(contract_text)
+    if len(chunks) == 1:
+        products = _parse_chunk(chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _CHUNK_CONCURRENCY)) as pool:
+            products = [p for found in pool.map(_parse_chunk, chunks) for p in found]
+
+    # Deduplicate by model_number (case-insensitive), keep first occurrence;
+    # this also merges the rows repeated in overlapping chunks
+    unique: dict[str, dict] = {}
     for p in products:
-        key = p["model_number"].strip().upper()
-        if key not in seen:
-            seen.add(key)
-            p["model_number"] = key
-            unique.append(p)
+        key = p["model_number"] = p["model_number"].strip().upper()
+        unique.setdefault(key, p)
 
-    return unique
+    return list(unique.values())
 
 
-def parse_products_from_pdf(pdf_bytes: bytes) -> list[dict]:
-    """Extract text from a PDF, then parse products with Claude."""
-    text = extract_text_from_pdf(pdf_bytes)
+def parse_products_from_pdf(pdf: bytes | str | os.PathLike) -> list[dict]:
+    """Extract text from a PDF (bytes or path), then parse products with Claude."""
+    text = extract_text_from_pdf(pdf)
     return parse_products_from_text(text)
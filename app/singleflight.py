@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# One Future per key currently being computed. Callers arriving while a key is
+# in flight wait on it instead of repeating the work.
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def with_singleflight(key: str, fn: Callable[[], T]) -> T:
+    """Run *fn*, unless a call for *key* is already running — then share its outcome.
+
+    Blocks the calling thread while waiting, so call it from worker threads,
+    not the event loop. Exceptions are shared with the waiters too.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+
+import orjson
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Shared Redis connection (optional)
+# ---------------------------------------------------------------------------
+# Only used when REDIS_URL is set, so a single-worker dev setup needs no Redis.
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """Return a shared Redis client, or None when REDIS_URL isn't configured."""
+    global _redis
+    url = os.environ.get("REDIS_URL")
+    if not url:
+        return None
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                import redis
+
+                _redis = redis.Redis.from_url(
+                    url, decode_responses=False, socket_timeout=1, socket_connect_timeout=1,
+                )
+    return _redis
+
+
+def _reset_redis_after_fork():
+    """Forked workers must not share the parent's sockets — reconnect lazily."""
+    global _redis, _redis_lock
+    _redis = None
+    _redis_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_redis_after_fork)
+
+
+# ---------------------------------------------------------------------------
+# Job state shared between the background workers and the polling routes
+# ---------------------------------------------------------------------------
+
+class JobStore:
+    """Small dict-like store of JSON-able job state.
+
+    With REDIS_URL set, entries live in Redis (one JSON string per key, expiring
+    after *ttl* seconds) so every worker process sees the same progress. Without
+    it — or while Redis is unreachable — they stay in this process, which is all
+    a single-worker dev server needs. The local copy expires on the same *ttl*
+    and keeps at most *maxsize* jobs, so abandoned ones don't accumulate.
+    """
+
+    def __init__(self, namespace: str, ttl: int, maxsize: int = 1024):
+        self._namespace = namespace
+        self._ttl = ttl
+        self._local: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> int:
+        return self._ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self._namespace}:{key}"
+
+    def __setitem__(self, key: str, value: dict):
+        r = get_redis()
+        if r is not None:
+            try:
+                r.set(self._key(key), orjson.dumps(value), ex=self._ttl)
+                return
+            except Exception as e:
+                logger.warning("Redis write failed for %s: %s", self._key(key), e)
+        with self._lock:
+            self._local[key] = value
+
+    def get(self, key: str, default: dict | None = None) -> dict | None:
+        r = get_redis()
+        if r is not None:
+            try:
+                raw = r.get(self._key(key))
+                if raw:
+                    return orjson.loads(raw)
+            except Exception as e:
+                logger.warning("Redis read failed for %s: %s", self._key(key), e)
+        # Also holds anything written while Redis was unreachable
+        with self._lock:
+            return self._local.get(key, default)
+
+    def pop(self, key: str, default: dict | None = None) -> dict | None:
+        value = None
+        r = get_redis()
+        if r is not None:
+            try:
+                raw = r.getdel(self._key(key))
+                value = orjson.loads(raw) if raw else None
+            except Exception as e:
+                logger.warning("Redis delete failed for %s: %s", self._key(key), e)
+        with self._lock:
+            local = self._local.pop(key, None)
+        if value is None:
+            value = local
+        return value if value is not None else default
@@ -45,3 +45,86 @@ CREATE TABLE IF NOT EXISTS project_items (
     notes         TEXT,
     created_at    TIMESTAMPTZ DEFAULT NOW()
 );
+
+-- Normalize line-item model numbers in the database so bulk inserts need no
+-- per-row pass in Python
+CREATE OR REPLACE FUNCTION normalize_project_item_model() RETURNS trigger AS $$
+BEGIN
+    NEW.model_number := upper(trim(NEW.model_number));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS project_items_normalize_model ON project_items;
+CREATE TRIGGER project_items_normalize_model
+    BEFORE INSERT OR UPDATE OF model_number ON project_items
+    FOR EACH ROW EXECUTE FUNCTION normalize_project_item_model();
+
+-- Apply a PATCH to a project item in one round trip: update the row, record a
+-- pasted manual URL in the product library, and return the item joined with
+-- its product (the same shape as select("*, products(*)")). Returned as a set
+-- of zero or one rows so PostgREST answers with a plain JSON array.
+DROP FUNCTION IF EXISTS apply_item_update(UUID, JSONB);
+CREATE FUNCTION apply_item_update(p_item_id UUID, p_patch JSONB)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    item       project_items;
+    v_manual   TEXT := NULLIF(p_patch->>'manual_url', '');
+    v_product  UUID;
+BEGIN
+    SELECT * INTO item FROM project_items WHERE id = p_item_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    -- Keys present in the patch override the stored values; others are kept
+    item := jsonb_populate_record(item, p_patch - 'id' - 'created_at');
+
+    UPDATE project_items
+       SET project_id    = item.project_id,
+           product_id    = item.product_id,
+           raw_line_item = item.raw_line_item,
+           brand         = item.brand,
+           model_number  = item.model_number,
+           product_name  = item.product_name,
+           status        = item.status,
+           manual_url    = item.manual_url,
+           notes         = item.notes
+     WHERE id = p_item_id
+    RETURNING * INTO item;
+
+    IF v_manual IS NOT NULL AND COALESCE(item.model_number, '') <> '' THEN
+        INSERT INTO products (model_number, brand, product_name, manual_source_url, last_verified)
+        VALUES (upper(trim(item.model_number)), item.brand, item.product_name, v_manual, NOW())
+        ON CONFLICT (model_number) DO UPDATE
+           SET brand             = EXCLUDED.brand,
+               product_name      = EXCLUDED.product_name,
+               manual_source_url = EXCLUDED.manual_source_url,
+               last_verified     = EXCLUDED.last_verified
+        RETURNING id INTO v_product;
+
+        UPDATE project_items SET product_id = v_product
+         WHERE id = p_item_id
+        RETURNING * INTO item;
+    END IF;
+
+    RETURN NEXT to_jsonb(item) || jsonb_build_object(
+        'products', (SELECT to_jsonb(p) FROM products p WHERE p.id = item.product_id)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Write background-search results to many items in one round trip. Only the
+-- result columns present in each row's JSON are changed, so edits made while
+-- the search ran are kept, and rows whose item was deleted meanwhile match
+-- nothing rather than being re-inserted.
+CREATE OR REPLACE FUNCTION bulk_update_project_items(p_rows JSONB)
+RETURNS VOID AS $$
+    UPDATE project_items AS i
+       SET status     = CASE WHEN r ? 'status'     THEN r->>'status'             ELSE i.status END,
+           manual_url = CASE WHEN r ? 'manual_url' THEN r->>'manual_url'         ELSE i.manual_url END,
+           product_id = CASE WHEN r ? 'product_id' THEN (r->>'product_id')::UUID ELSE i.product_id END,
+           notes      = CASE WHEN r ? 'notes'      THEN r->>'notes'              ELSE i.notes END
+      FROM jsonb_array_elements(p_rows) AS r
+     WHERE i.id = (r->>'id')::UUID;
+$$ LANGUAGE sql;